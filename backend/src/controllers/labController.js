@@ -1,4 +1,5 @@
 // rpcClient.js
+import http from 'http';
 import xmlrpc from 'xmlrpc';
 
 export const REQ_UR_START_SORTING   = 2301;
@@ -10,7 +11,9 @@ export const REQ_PLC_STOP_CONVEYOR  = 2102;
 const client = xmlrpc.createClient({
   host: '172.18.0.60',
   port: 4840,
-  path: '/RPC2'
+  path: '/RPC2',
+  // Gjenbruk TCP-tilkoblinger (serveren støtter HTTP/1.1 keep-alive)
+  agent: new http.Agent({ keepAlive: true, maxSockets: 4 })
 });
 
 function clientCall(method, params = []) {
@@ -26,6 +29,19 @@ function clientCall(method, params = []) {
   });
 }
 
+// Flere kall i én forespørsel via system.multicall. calls = [[metode, [params]], ...]
+function clientMulticall(calls) {
+  const batch = calls.map(([methodName, params = []]) => ({ methodName, params }));
+  return clientCall('system.multicall', [batch]).then((results) =>
+    results.map((result, i) => {
+      if (result && result.faultCode !== undefined) {
+        throw new Error(`Feil i ${calls[i][0]}: ${result.faultString}`);
+      }
+      return result[0];
+    })
+  );
+}
+
 export async function startSorting() {
   try {
     // Her sendes riktig ID for "start sorting"-jobben
@@ -50,10 +66,12 @@ export async function stopSorting() {
 
 export async function resetDemo() {
   try {
-    const response_ur    = await clientCall('set_ur_job', [REQ_UR_STOP_SORTING]);
-    const responsePlc   = await clientCall('set_ur_job', [REQ_PLC_STOP_CONVEYOR]);
-    const response_data = await clientCall('clear_sorting_data', []);
-    const response_ramp = await clientCall('clear_ur_sorting_ramp', []);
+    const [response_ur, responsePlc, response_data, response_ramp] = await clientMulticall([
+      ['set_ur_job', [REQ_UR_STOP_SORTING]],
+      ['set_ur_job', [REQ_PLC_STOP_CONVEYOR]],
+      ['clear_sorting_data', []],
+      ['clear_ur_sorting_ramp', []]
+    ]);
     return {
       urResponse:    response_ur,
       plcResponse:   responsePlc,
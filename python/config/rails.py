@@ -0,0 +1,67 @@
+"""
+rails.py
+• Felles konfigurasjon av skinnegeometri: antall skinner, lengde og PLC-adresser.
+• DataStore, PLC-handleren og databaseplasseringen avleder alt fra denne modulen,
+  slik at skinnegeometrien kun er definert ett sted.
+• Standardoppsettet er cellens fire skinner à 10 posisjoner (rampe, gul, grønn, begge).
+• Kan overstyres med miljøvariabelen RAIL_CONFIG (JSON), f.eks.:
+    RAIL_CONFIG='{"length": 16, "plc_base_offset": 4,
+                  "rails": [{"name": "ramp", "sync": true}, {"name": "gul"}, {"name": "rod"}]}'
+  Felt per skinne: name (påkrevd), field (standard UR_SORTING_<NAME>),
+  plc_offset (standard fortløpende fra plc_base_offset), sync (skrives til PLC, standard false).
+• Merk: XML-RPC støtter kun 32-bits heltall, så mask-metodene i DataStore krever length <= 31
+  (MAX_RAIL_LENGTH, sjekkes ved lasting).
+"""
+
+import json
+import os
+from typing import NamedTuple, Tuple
+
+MAX_RAIL_LENGTH = 31   # Bitmasken må passe i et positivt 32-bits XML-RPC-heltall
+
+
+class Rail(NamedTuple):
+    name: str        # Kortnavn brukt i RPC (f.eks. "ramp")
+    field: str       # Feltnavn i Data (f.eks. "UR_SORTING_RAMP")
+    plc_offset: int  # Byte-offset i PLC_DB_AREA der skinnens bits starter
+    sync: bool       # Om endringer i DataStore skal skrives til PLC
+
+
+DEFAULT_CONFIG = {
+    "length": 10,
+    "plc_base_offset": 4,
+    "rails": [
+        {"name": "ramp",  "field": "UR_SORTING_RAMP",  "sync": True},
+        {"name": "gul",   "field": "UR_SORTING_GUL"},
+        {"name": "gronn", "field": "UR_SORTING_GRONN"},
+        {"name": "begge", "field": "UR_SORTING_BEGGE"},
+    ],
+}
+
+
+def _load(config: dict) -> Tuple[int, Tuple[Rail, ...]]:
+    length = int(config.get("length", DEFAULT_CONFIG["length"]))
+    if not 1 <= length <= MAX_RAIL_LENGTH:
+        raise ValueError(f"Ugyldig skinnelengde: {length} (må være 1–{MAX_RAIL_LENGTH})")
+    bytes_per_rail = (length + 7) // 8
+    offset = int(config.get("plc_base_offset", DEFAULT_CONFIG["plc_base_offset"]))
+    rails = []
+    for entry in config.get("rails", DEFAULT_CONFIG["rails"]):
+        name = entry["name"]
+        rail_offset = int(entry.get("plc_offset", offset))
+        rails.append(Rail(
+            name=name,
+            field=entry.get("field", f"UR_SORTING_{name.upper()}"),
+            plc_offset=rail_offset,
+            sync=bool(entry.get("sync", False)),
+        ))
+        offset = rail_offset + bytes_per_rail
+    if len({r.name for r in rails}) != len(rails) or len({r.field for r in rails}) != len(rails):
+        raise ValueError("Skinnenavn og feltnavn må være unike")
+    return length, tuple(rails)
+
+
+_env_config = os.getenv("RAIL_CONFIG")
+RAIL_LENGTH, RAILS = _load(json.loads(_env_config) if _env_config else DEFAULT_CONFIG)
+RAIL_FULL_MASK = (1 << RAIL_LENGTH) - 1
+RAIL_BY_NAME = {rail.name: rail for rail in RAILS}
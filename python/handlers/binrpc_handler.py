@@ -0,0 +1,219 @@
+"""
+Binary RPC Handler Module
+Kompakt, lengdeprefiksert binærprotokoll over TCP for robotklienter som poller med høy frekvens.
+Samme metoder som XML-RPC: kallene går gjennom XML-RPC-serverens dispatcher (samme registrering).
+
+Rammeformat (big-endian):
+    u32 lengde | u32 id | u8 kodek | u8 status | nyttelast
+- lengde teller alt etter lengdefeltet.
+- Forespørsel: status = 0, nyttelast = [metode, [parametre]].
+- Svar: status = 0 (nyttelast = resultat) eller 1 (nyttelast = [feilkode, melding]).
+- kodek: 0 = kompakt JSON, 1 = msgpack (bare hvis pakken er installert). Svaret bruker samme kodek.
+  Datoer sendes som ISO-strenger.
+
+Pipelining: en klient kan ha mange forespørsler ute samtidig på samme tilkobling. Serveren
+behandler dem parallelt og svarer når hver er ferdig (ikke nødvendigvis i rekkefølge); svarene
+matches på id. BIN_MAX_IN_FLIGHT begrenser antall samtidige per tilkobling.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+from xmlrpc.client import Fault
+from handlers.rpc_dispatch import MethodNotFound, call_method, json_default
+
+try:
+    import msgpack
+except ImportError:   # Valgfri avhengighet – JSON brukes da
+    msgpack = None
+
+BIN_PORT = int(os.getenv("BIN_PORT", "0"))                       # 0 = binærserveren er av
+BIN_RPC_WORKERS = int(os.getenv("BIN_RPC_WORKERS", "8"))         # Tråder for blokkerende DataStore-kall
+BIN_MAX_IN_FLIGHT = int(os.getenv("BIN_MAX_IN_FLIGHT", "32"))    # Samtidige forespørsler per tilkobling
+BIN_MAX_FRAME = 4 * 1024 * 1024                                  # Maks rammestørrelse (byte)
+
+CODEC_JSON = 0
+CODEC_MSGPACK = 1
+
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+PROTOCOL_ERROR = -32600
+METHOD_NOT_FOUND = -32601
+SERVER_ERROR = -32000
+
+LENGTH = struct.Struct(">I")
+HEADER = struct.Struct(">IBB")   # id, kodek, status
+
+logger = logging.getLogger(__name__)
+
+
+# --------------------------------------------------
+# Kodeker
+# --------------------------------------------------
+_json_encoder = json.JSONEncoder(default=json_default, separators=(",", ":"), ensure_ascii=False)
+
+
+def encode(codec: int, obj: Any) -> bytes:
+    if codec == CODEC_MSGPACK and msgpack is not None:
+        return msgpack.packb(obj, default=json_default, use_bin_type=True)
+    if codec == CODEC_JSON:
+        return _json_encoder.encode(obj).encode()
+    raise ValueError(f"Ukjent kodek {codec}")
+
+
+def decode(codec: int, data: bytes) -> Any:
+    if codec == CODEC_MSGPACK and msgpack is not None:
+        return msgpack.unpackb(data, raw=False)
+    if codec == CODEC_JSON:
+        return json.loads(data)
+    raise ValueError(f"Ukjent kodek {codec}")
+
+
+def frame(req_id: int, codec: int, status: int, payload: bytes) -> bytes:
+    return LENGTH.pack(HEADER.size + len(payload)) + HEADER.pack(req_id, codec, status) + payload
+
+
+# --------------------------------------------------
+# Server
+# --------------------------------------------------
+class BinaryRpcServer:
+    def __init__(self, dispatcher: Any, host: str = "0.0.0.0", port: int = BIN_PORT,
+                 workers: int = BIN_RPC_WORKERS) -> None:
+        self.dispatcher = dispatcher
+        self.host = host
+        self.port = port
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="BIN-RPC")
+
+    async def serve(self) -> None:
+        server = await asyncio.start_server(self._connection, self.host, self.port)
+        logger.info("Binær RPC-server lytter på %s:%d", self.host, self.port)
+        async with server:
+            await server.serve_forever()
+
+    async def _connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        in_flight = asyncio.Semaphore(BIN_MAX_IN_FLIGHT)
+        tasks: Set[asyncio.Task] = set()   # Sterke referanser – løkken holder bare svake
+        try:
+            while True:
+                (length,) = LENGTH.unpack(await reader.readexactly(LENGTH.size))
+                if not HEADER.size <= length <= BIN_MAX_FRAME:
+                    logger.warning("Ugyldig rammelengde %d – lukker tilkoblingen", length)
+                    break
+                data = await reader.readexactly(length)
+                req_id, codec, _ = HEADER.unpack_from(data)
+                await in_flight.acquire()   # Mottrykk: slutt å lese når for mange er ute
+                task = asyncio.create_task(self._handle(writer, req_id, codec, data[HEADER.size:], in_flight))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+            for task in list(tasks):
+                task.cancel()
+
+    async def _handle(self, writer: asyncio.StreamWriter, req_id: int, codec: int,
+                      payload: bytes, in_flight: asyncio.Semaphore) -> None:
+        try:
+            if codec == CODEC_JSON or (codec == CODEC_MSGPACK and msgpack is not None):
+                status, body = await self._call(codec, payload)
+            else:
+                codec = CODEC_JSON   # Svar med JSON så klienten kan lese feilen
+                status, body = STATUS_ERROR, [PROTOCOL_ERROR, "Ukjent eller utilgjengelig kodek"]
+            try:
+                data = encode(codec, body)
+            except Exception as e:
+                status, data = STATUS_ERROR, encode(codec, [SERVER_ERROR, f"Kunne ikke kode svaret: {e}"])
+            writer.write(frame(req_id, codec, status, data))
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            in_flight.release()
+
+    async def _call(self, codec: int, payload: bytes) -> Tuple[int, Any]:
+        try:
+            method, params = decode(codec, payload)
+        except Exception:
+            return STATUS_ERROR, [PROTOCOL_ERROR, "Ugyldig forespørsel (forventer [metode, [parametre]])"]
+        loop = asyncio.get_running_loop()
+        try:
+            result = await loop.run_in_executor(self._executor, call_method, self.dispatcher, method, params)
+        except MethodNotFound as e:
+            return STATUS_ERROR, [METHOD_NOT_FOUND, str(e)]
+        except Fault as e:
+            return STATUS_ERROR, [e.faultCode, e.faultString]
+        except Exception as e:
+            return STATUS_ERROR, [SERVER_ERROR, f"{type(e).__name__}: {e}"]
+        return STATUS_OK, result
+
+
+def start_binary_server(dispatcher: Any, host: str = "0.0.0.0",
+                        port: int = BIN_PORT) -> Optional[threading.Thread]:
+    """Start binærserveren i egen tråd med egen event-loop. Returnerer None hvis den er av."""
+    if port <= 0:
+        return None
+    server = BinaryRpcServer(dispatcher, host, port)
+    thread = threading.Thread(target=asyncio.run, args=(server.serve(),), name="BIN-Server-Thread", daemon=True)
+    thread.start()
+    return thread
+
+
+# --------------------------------------------------
+# Klient
+# --------------------------------------------------
+class BinaryRpcClient:
+    """
+    Synkron klient med pipelining:
+        client = BinaryRpcClient("172.18.0.60", 4842)
+        ramp = client.call("get_ur_sorting_ramp")
+        status, job = client.pipeline([("get_plc_status", []), ("get_ur_job", [])])
+    """
+    def __init__(self, host: str, port: int, timeout: float = 10.0, codec: Optional[int] = None) -> None:
+        self.codec = codec if codec is not None else (CODEC_MSGPACK if msgpack is not None else CODEC_JSON)
+        self._sock = socket.create_connection((host, port), timeout=timeout)
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._rfile = self._sock.makefile("rb")
+        self._next_id = 0
+
+    def call(self, method: str, *params: Any) -> Any:
+        result = self.pipeline([(method, params)])[0]
+        if isinstance(result, Fault):
+            raise result
+        return result
+
+    def pipeline(self, calls: Iterable[Tuple[str, Sequence[Any]]]) -> List[Any]:
+        """Send alle kallene i én skriving og vent på alle svarene. Feil returneres som Fault-objekter."""
+        ids: List[int] = []
+        out = []
+        for method, params in calls:
+            self._next_id = (self._next_id + 1) & 0xFFFFFFFF
+            ids.append(self._next_id)
+            out.append(frame(self._next_id, self.codec, STATUS_OK, encode(self.codec, [method, list(params)])))
+        self._sock.sendall(b"".join(out))
+
+        results: Dict[int, Any] = {}
+        while len(results) < len(ids):
+            (length,) = LENGTH.unpack(self._read(LENGTH.size))
+            data = self._read(length)
+            req_id, codec, status = HEADER.unpack_from(data)
+            body = decode(codec, data[HEADER.size:])
+            results[req_id] = Fault(body[0], body[1]) if status == STATUS_ERROR else body
+        return [results[i] for i in ids]
+
+    def _read(self, n: int) -> bytes:
+        data = self._rfile.read(n)
+        if len(data) < n:
+            raise ConnectionError("Tilkoblingen ble lukket av serveren")
+        return data
+
+    def close(self) -> None:
+        self._rfile.close()
+        self._sock.close()
@@ -5,64 +5,73 @@ Den bruker Snap7-biblioteket for å kommunisere med Siemens S7 PLC-er.
 
 Hovedfunksjoner:
 - Kommunikasjon med PLC for å lese og skrive sorteringsdata.
-- Håndtering av skinner (rampe, gul, grønn, begge) ved å lese og skrive til spesifikke DINT-adresser.
+- Håndtering av skinner (konfigurert i config/rails.py) ved å lese og skrive bits i PLC_DB_AREA.
 - Håndtering av jobber og signaler fra PLC for å starte og stoppe sortering.
 - Periodisk oppdatering av DataStore med PLC-data.
 
 """
 
+import os
 import time
-from middleware.s7_com import PLC
+from middleware.s7_com import PLC, Tag
 import store.SharedDataStore as C
 from store.SharedDataStore import DataStore
 import traceback
+from itertools import chain
+from config.rails import RAILS, RAIL_LENGTH
 
-PLC_DB_AREA = "DB400"
+PLC_DB_NUMBER = 400
+PLC_DB_AREA = f"DB{PLC_DB_NUMBER}"
 DB_WRITE_AREA = "DB500"
 
 PLC_PICKUP_READY_ADDRESS = f"{DB_WRITE_AREA},BOOL0.0"
 PLC_JOB_COMMAND_ADDRESS = f"{PLC_DB_AREA},INT0.0"
 
-# Offsets for skinne data i PLC
-RAMPE_SKINNE_OFFSET = 4
-GUL_SKINNE_OFFSET = 6
-GRO_SKINNE_OFFSET = 8
-GG_SKINNE_OFFSET = 10
-SKINNE_LENGTH = 10 # Antall elementer i en skinne-liste
+# Forhåndskompilerte tags (parses én gang ved import, ikke i skannesløyfen)
+PLC_PICKUP_READY_TAG = Tag.get(PLC_PICKUP_READY_ADDRESS)
+PLC_JOB_COMMAND_TAG = Tag.get(PLC_JOB_COMMAND_ADDRESS)
+
+# Skinnegeometri (antall, lengde og offsets i PLC_DB_AREA) kommer fra config/rails.py
+SKINNE_LENGTH = RAIL_LENGTH # Antall elementer i en skinne-liste
+
+# Skanneperiode (sekunder): maks ventetid mellom to sykluser når ingenting endres.
+# Endringer i DataStore (jobb/skinner) vekker tråden umiddelbart.
+PLC_SCAN_PERIOD = float(os.getenv("PLC_SCAN_PERIOD", "1.0"))
+
+# PLC-en har ett INT-kommandoregister og kvitterer en jobb ved å sette registeret tilbake til 0.
+# Neste jobb fra køen skrives først når forrige er kvittert, så jobber aldri overskriver hverandre.
+# Kvitteres ikke jobben innen PLC_JOB_ACK_TIMEOUT sekunder, logges det og neste jobb sendes.
+PLC_JOB_ACK_TIMEOUT = float(os.getenv("PLC_JOB_ACK_TIMEOUT", "2.0"))
+PLC_JOB_ACK_POLL = 0.02 # Sekunder mellom lesinger av kommandoregisteret mens en jobb venter på kvittering
 
 
 def bool_to_int(value) -> int:
     """Konverterer en bool til int (0 eller 1)."""
     return 1 if value else 0
 
-def _iter_skinne_dint_addresses(base_offset: int, count: int = SKINNE_LENGTH):
+def _read_all_skinner_from_plc(plc: PLC, offsets: list[int]) -> list[int]:
     """
-    Hjelpefunksjon for å iterere over de spesifikke (x, y) DINT-adressene for skinner.
-    Yields: (byte_offset, bit_offset_within_byte)
+    Leser flere skinner med én read_area over hele byte-området de dekker,
+    og deler opp bitmasken lokalt. Brukes ved oppstart for å synkronisere alle skinner.
     """
-    x = base_offset
-    y = 0
-    for _ in range(count):
-        yield x, y
-        y += 1
-        if y >= 8: # Etter at 8 bit-offsets (0-7) er brukt for en byte_offset (x)
-            x += 1
-            y = 0
-
-def _read_skinne_data_from_plc(plc: PLC, base_offset: int) -> list[int]:
-    """Leser en komplett skinne-liste fra PLC."""
-    data = []
-    for x, y in _iter_skinne_dint_addresses(base_offset):
-        address_str = f"{PLC_DB_AREA},BOOL{x}.{y}"
-        
-        data.append(bool_to_int(plc.read_node(address_str)))
-    return data
-
-def _write_skinne_data_to_plc(plc: PLC, base_offset: int, data_to_write: list[int]) -> None:
-    """Skriver en komplett skinne-liste til PLC."""
-    for i, (x, y) in enumerate(_iter_skinne_dint_addresses(base_offset, count=len(data_to_write))):
-        address_str = f"{PLC_DB_AREA},BOOL{x}.{y}"
-        plc.write_node(address_str, data_to_write[i])
+    first = min(offsets)
+    span_bits = (max(offsets) - first) * 8 + SKINNE_LENGTH
+    mask = plc.read_mask(PLC_DB_NUMBER, first, span_bits)
+    skinne_mask = (1 << SKINNE_LENGTH) - 1
+    return [(mask >> ((ofs - first) * 8)) & skinne_mask for ofs in offsets]
+
+def _skinne_bit_tags(base_offset: int, count: int = SKINNE_LENGTH) -> list[Tag]:
+    """Tags for hver bit i en skinne (bit i ligger i byte base_offset + i // 8, bit i % 8)."""
+    return [Tag.get(f"{PLC_DB_AREA},BOOL{base_offset + i // 8}.{i % 8}") for i in range(count)]
+
+def _skinne_changes(tags: list[Tag], new_mask: int, diff: int) -> dict[Tag, int]:
+    """Returnerer {tag: verdi} for hver bit satt i diff (= ny maske XOR forrige skrevne maske)."""
+    changes = {}
+    while diff:
+        low = diff & -diff
+        changes[tags[low.bit_length() - 1]] = bool_to_int(new_mask & low)
+        diff ^= low
+    return changes
 
 def plc_job(data_store: DataStore):
     """Hovedfunksjon for PLC-kommunikasjonstråden."""
@@ -71,49 +80,56 @@ def plc_job(data_store: DataStore):
     print(f"[{current_time}][PLC_JOB] Starter PLC-jobb ...")
     data_store.set_plc_status(C.RUNNING) # Status for initialisering
 
-    local_plc_pickup_ready = s7_plc.read_node(PLC_PICKUP_READY_ADDRESS)
+    local_plc_pickup_ready = s7_plc.read_node(PLC_PICKUP_READY_TAG)
 
-    local_plc_rampe_state = _read_skinne_data_from_plc(s7_plc, RAMPE_SKINNE_OFFSET)
-    local_plc_gul_state = _read_skinne_data_from_plc(s7_plc, GUL_SKINNE_OFFSET)
-    local_plc_gro_state = _read_skinne_data_from_plc(s7_plc, GRO_SKINNE_OFFSET)
-    local_plc_gg_state = _read_skinne_data_from_plc(s7_plc, GG_SKINNE_OFFSET)
+    # Lokal cache av skinnene slik de sist ble lest/skrevet i PLC (bitmasker)
+    local_plc_masks = dict(zip(
+        (rail.name for rail in RAILS),
+        _read_all_skinner_from_plc(s7_plc, [rail.plc_offset for rail in RAILS])))
 
     # --- Synkroniser DataStore med initiell PLC-tilstand ---
-    data_store.set_ur_sorting_ramp_full(list(local_plc_rampe_state)) # Send kopi
-    data_store.set_ur_sorting_gul_full(list(local_plc_gul_state))
-    data_store.set_ur_sorting_gronn_full(list(local_plc_gro_state))
-    data_store.set_ur_sorting_begge_full(list(local_plc_gg_state))
+    for rail, mask in local_plc_masks.items():
+        data_store.set_ur_sorting_mask(rail, mask)
 
-    print(f"[{current_time}][PLC_JOB] Initial Rampe state: {local_plc_rampe_state}")
+    for rail, mask in local_plc_masks.items():
+        print(f"[{current_time}][PLC_JOB] Initial {rail} state: {C.mask_to_list(mask)}")
+
+    # --- Tag-grupper: alt som leses/skrives i en syklus pakkes i færrest mulig PDU-er ---
+    # Kun skinner med sync=True i config/rails.py skrives til PLC
+    rail_tags = {rail.name: _skinne_bit_tags(rail.plc_offset) for rail in RAILS if rail.sync}
+    cycle_reads = s7_plc.tag_group([PLC_PICKUP_READY_TAG, PLC_JOB_COMMAND_TAG])
+    cycle_writes = s7_plc.tag_group([PLC_JOB_COMMAND_TAG, *chain.from_iterable(rail_tags.values())])
+    rail_version = 0 # Siste DataStore-versjon skinnene er sjekket mot
+    job_in_flight = None # (jobb, skrevet_tidspunkt) for jobben PLC-en ennå ikke har kvittert
 
     # --- Hovedløkke hjelpefunksjoner (definert her for å ha tilgang til s7_plc, data_store, og lokal cache) ---
     def _update_one_skinne_on_plc_if_changed(
-            ds_getter_method,
-            local_plc_cache_list: list,
-            plc_offset: int,
-            skinne_navn: str
+            rail: str,
+            current_ds_mask: int,
+            pending_writes: dict
     ):
-        """Sammenligner DataStore-verdi med lokal PLC-cache og skriver til PLC ved endring."""
-        current_ds_state = ds_getter_method()
-        if current_ds_state != local_plc_cache_list:
+        """Sammenligner DataStore-masken med lokal PLC-cache og legger endrede bits i pending_writes."""
+        diff = current_ds_mask ^ local_plc_masks[rail]
+        if diff:
             current_time = time.strftime("%H:%M:%S", time.localtime())
-            print(f"[{current_time}][PLC_JOB] Oppdaget endring i '{skinne_navn}' skinne-data.")
-            _write_skinne_data_to_plc(s7_plc, plc_offset, current_ds_state)
-            local_plc_cache_list[:] = current_ds_state # Oppdater lokal cache in-place
-
-    def _handle_periodic_skinne_updates():
-        """Håndterer oppdatering av alle skinner fra DataStore til PLC."""
-        _update_one_skinne_on_plc_if_changed(data_store.get_ur_sorting_ramp, local_plc_rampe_state, RAMPE_SKINNE_OFFSET, "Rampe")
-        #_update_one_skinne_on_plc_if_changed(data_store.get_ur_sorting_gul, local_plc_gul_state, GUL_SKINNE_OFFSET, "Gul")
-        #_update_one_skinne_on_plc_if_changed(data_store.get_ur_sorting_gronn, local_plc_gro_state, GRO_SKINNE_OFFSET, "Grønn")
-        #_update_one_skinne_on_plc_if_changed(data_store.get_ur_sorting_begge, local_plc_gg_state, GG_SKINNE_OFFSET, "Begge")
-
-    def _handle_periodic_job_and_signal_updates():
+            print(f"[{current_time}][PLC_JOB] Oppdaget endring i '{rail}' skinne-data.")
+            pending_writes.update(_skinne_changes(rail_tags[rail], current_ds_mask, diff))
+            local_plc_masks[rail] = current_ds_mask # Oppdater lokal cache
+
+    def _handle_periodic_skinne_updates(pending_writes: dict):
+        """Skriver skinner som er endret i DataStore siden forrige syklus til PLC."""
+        nonlocal rail_version
+        rail_version, changed_masks = data_store._get_rail_masks_since(rail_version)
+        for rail, mask in changed_masks.items():
+            if rail in rail_tags:
+                _update_one_skinne_on_plc_if_changed(rail, mask, pending_writes)
+
+    def _handle_periodic_job_and_signal_updates(pending_writes: dict):
         """Håndterer PLC-jobber fra DataStore og pickup_ready signalet fra PLC."""
-        nonlocal local_plc_pickup_ready
-
-        current_pickup_signal_from_plc = s7_plc.read_node(PLC_PICKUP_READY_ADDRESS)
+        nonlocal local_plc_pickup_ready, job_in_flight
 
+        values = cycle_reads.read()
+        current_pickup_signal_from_plc = values[PLC_PICKUP_READY_TAG]
 
         if current_pickup_signal_from_plc != local_plc_pickup_ready:
             current_time = time.strftime("%H:%M:%S", time.localtime())
@@ -122,13 +138,32 @@ def plc_job(data_store: DataStore):
             data_store.set_ur_job(ur_job_request)
             print(f"[{current_time}][PLC_JOB] Pickup signal endret til {local_plc_pickup_ready}. UR Job satt til: {ur_job_request}")
 
-        # 2. Hent jobb fra DataStore og skriv til PLC hvis den finnes
-        job_for_plc = data_store.get_plc_job()
-        if job_for_plc != 0:
+        # 2. Vent på kvittering for forrige jobb (PLC setter kommandoregisteret til 0)
+        if job_in_flight is not None:
+            job, written_at = job_in_flight
+            waited = time.monotonic() - written_at
+            if values[PLC_JOB_COMMAND_TAG] == 0:
+                job_in_flight = None
+            elif waited >= PLC_JOB_ACK_TIMEOUT:
+                current_time = time.strftime("%H:%M:%S", time.localtime())
+                print(f"[{current_time}][PLC_JOB] PLC kvitterte ikke jobb {job} innen {PLC_JOB_ACK_TIMEOUT:.1f} s "
+                      f"(register={values[PLC_JOB_COMMAND_TAG]}) – sender neste jobb")
+                job_in_flight = None
+            else:
+                return
+
+        # 3. Hent neste jobb fra DataStore-køen og legg den i syklusens skriving hvis den finnes
+        for job_for_plc, age in data_store._take_plc_jobs(1):
             current_time = time.strftime("%H:%M:%S", time.localtime())
-            print(f"[{current_time}][PLC_JOB] Skriver jobb {job_for_plc} til PLC på adresse {PLC_JOB_COMMAND_ADDRESS}")
-            s7_plc.write_node(PLC_JOB_COMMAND_ADDRESS, job_for_plc)
-            data_store.clear_plc_job()
+            print(f"[{current_time}][PLC_JOB] Skriver jobb {job_for_plc} til PLC på adresse {PLC_JOB_COMMAND_ADDRESS} "
+                  f"(ventet {age * 1000:.1f} ms i kø)")
+            pending_writes[PLC_JOB_COMMAND_TAG] = job_for_plc
+            job_in_flight = (job_for_plc, time.monotonic())
+
+    def _flush_pending_writes(pending_writes: dict):
+        """Sender alle skrivinger for syklusen samlet (WriteMultiVars)."""
+        if pending_writes:
+            cycle_writes.write(pending_writes)
 
     # --- Hovedløkke ---
     data_store.set_plc_status(C.IDLE) # Klar til å kjøre hovedløkken
@@ -136,11 +171,16 @@ def plc_job(data_store: DataStore):
         while True:
             data_store.set_plc_status(C.RUNNING) # Viser at tråden aktivt jobber
 
-            _handle_periodic_job_and_signal_updates()
-            _handle_periodic_skinne_updates()
+            pending_writes = {}
+            _handle_periodic_job_and_signal_updates(pending_writes)
+            _handle_periodic_skinne_updates(pending_writes)
+            _flush_pending_writes(pending_writes)
 
             data_store.set_plc_status(C.IDLE) # Ferdig med syklus, venter
-            time.sleep(1)
+            if job_in_flight is not None:
+                time.sleep(PLC_JOB_ACK_POLL) # Les kommandoregisteret igjen snart
+            elif not data_store.get_plc_job():
+                data_store._wait_for_plc_work(PLC_SCAN_PERIOD) # Vekkes ved endring, ellers én poll per periode
     except Exception as e:
         print(f"[PLC_JOB] Kritisk feil i hovedløkken: {e}")
         data_store.set_plc_status(C.ERROR)
@@ -0,0 +1,112 @@
+"""
+Response Cache Module
+Ferdig kodede XML-RPC-svar for lesemetoder som polles ofte (get_ur_sorting_ramp, get_plc_status,
+get_rack_contents osv.), så uendrede verdier ikke marshalles til XML på nytt ved hvert kall.
+
+Hovedfunksjoner:
+- Svarbytes lagres per (metode, parametre) sammen med versjonen dataene hadde: feltversjonen i
+  DataStore, eller rackets generasjon i RackIndex for get_rack_contents (DataStore.get_read_version).
+- Et nytt kall med samme versjon er et ordbokoppslag pluss skriving til socketen.
+- Svaret får en ETag avledet av (metode, parametre, versjon). Sender klienten den tilbake i
+  If-None-Match og den er lik ETag-en til det lagrede svaret for samme nøkkel, svarer
+  RequestHandler med 304 Not Modified uten innhold. En ETag fra én metode (eller andre
+  parametre) kan dermed aldri gi 304 på en annen.
+- Versjonen leses før kallet utføres: endres dataene underveis, lagres svaret under den gamle
+  versjonen og erstattes ved neste kall – et utdatert svar får aldri en ny versjon.
+- Feilsvar (fault) caches ikke.
+"""
+
+import hashlib
+import os
+import threading
+import uuid
+import xmlrpc.client
+from typing import Any, Callable, Dict, Optional, Tuple
+
+RPC_CACHE_SIZE = int(os.getenv("RPC_CACHE_SIZE", "256"))   # Maks antall cachede svar (0 = av)
+
+# (metode, parametre) -> versjon, eller None hvis kallet ikke kan caches
+VersionFunc = Callable[[str, Tuple[Any, ...]], Optional[int]]
+
+
+def _method_name(data: bytes) -> Optional[str]:
+    """Metodenavnet fra en XML-RPC-forespørsel uten å tolke hele dokumentet."""
+    start = data.find(b"<methodName>")
+    end = data.find(b"</methodName>", start)
+    if start < 0 or end < 0:
+        return None
+    return data[start + len(b"<methodName>"):end].strip().decode("utf-8", "replace")
+
+
+class ResponseCache:
+    """Trådsikker cache av kodede svar: (metode, parametre) -> (etag, svarbytes)."""
+
+    def __init__(self, read_version: VersionFunc, methods: Any,
+                 max_entries: int = RPC_CACHE_SIZE) -> None:
+        self.read_version = read_version
+        self.methods = frozenset(methods)
+        self.max_entries = max_entries
+        self._prefix = uuid.uuid4().hex[:8]   # Ny for hver prosess, så gamle ETag-er aldri treffer
+        self._entries: Dict[Tuple[str, Tuple[Any, ...]], Tuple[str, bytes]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def respond(self, data: bytes, dispatch: Callable[[bytes], bytes],
+                if_none_match: Optional[str] = None) -> Tuple[Optional[str], Optional[bytes]]:
+        """
+        Svar på forespørselen `data`. `dispatch` er serverens _marshaled_dispatch og brukes ved bom
+        og for metoder som ikke caches. Returnerer (etag, svarbytes); svarbytes er None når klienten
+        allerede har gjeldende versjon (304), og etag er None når svaret ikke kan caches.
+        """
+        method = _method_name(data)
+        if method not in self.methods:
+            return None, dispatch(data)
+        try:
+            params, _ = xmlrpc.client.loads(data)
+            key = (method, params)
+            hash(key)
+            version = self.read_version(method, params)
+        except Exception:
+            return None, dispatch(data)   # Ugyldig forespørsel eller parametre – la dispatcheren svare
+        if version is None:
+            return None, dispatch(data)
+
+        etag = self._etag(key, version)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == etag:
+                if if_none_match == etag:
+                    self.not_modified += 1
+                    return etag, None
+                self.hits += 1
+                return etag, entry[1]
+            self.misses += 1
+
+        response = dispatch(data)
+        if b"<fault>" in response[:128]:
+            return None, response
+        with self._lock:
+            if key not in self._entries and len(self._entries) >= self.max_entries:
+                del self._entries[next(iter(self._entries))]   # Eldste innsatte nøkkel ut
+            self._entries[key] = (etag, response)
+        return etag, response
+
+    def _etag(self, key: Tuple[str, Tuple[Any, ...]], version: int) -> str:
+        digest = hashlib.blake2b(repr((key, version)).encode(), digest_size=8).hexdigest()
+        return f'"{self._prefix}-{digest}"'
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "not_modified": self.not_modified,
+            }
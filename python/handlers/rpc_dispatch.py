@@ -0,0 +1,54 @@
+"""
+RPC Dispatch Module
+Felles for transportene ved siden av XML-RPC (binær RPC og JSON-RPC over WebSocket), som kaller
+metodene registrert på XML-RPC-serverens dispatcher.
+
+Hovedfunksjoner:
+- Metodeoppslag mot dispatcherens registrering (funcs, deretter instansen med
+  resolve_dotted_attribute) – ukjente metoder gir MethodNotFound i stedet for at feilteksten
+  fra xmlrpc.server må tolkes.
+- Kall innenfor dispatcherens long-poll-grense (long_poll_slot i main.py) når den finnes.
+- Standardkoding av verdier JSON/msgpack ikke kan kode selv (datoer som ISO-strenger).
+"""
+
+from contextlib import nullcontext
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Optional, Sequence
+from xmlrpc.server import resolve_dotted_attribute
+
+
+class MethodNotFound(Exception):
+    def __init__(self, method: str) -> None:
+        super().__init__(f"Ukjent metode {method!r}")
+        self.method = method
+
+
+def json_default(obj: Any) -> Any:
+    """`default` for json/msgpack: datoer som ISO-strenger, sett og tupler som lister, ellers str."""
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, (set, tuple)):
+        return list(obj)
+    return str(obj)
+
+
+def resolve_method(dispatcher: Any, method: str) -> Callable[..., Any]:
+    """Funksjonen `method` er registrert som, samme oppslag som SimpleXMLRPCDispatcher._dispatch."""
+    func = dispatcher.funcs.get(method)
+    if func is None and dispatcher.instance is not None:
+        try:
+            func = resolve_dotted_attribute(dispatcher.instance, method, dispatcher.allow_dotted_names)
+        except AttributeError:
+            func = None
+    if func is None or not callable(func):
+        raise MethodNotFound(method)
+    return func
+
+
+def call_method(dispatcher: Any, method: str, args: Sequence[Any] = (),
+                kwargs: Optional[Dict[str, Any]] = None) -> Any:
+    """Slår opp og kaller `method`. Kjøres i en arbeidertråd; long-poll-kall kan blokkere."""
+    func = resolve_method(dispatcher, method)
+    slot = getattr(dispatcher, "long_poll_slot", None)
+    with slot(method) if slot is not None else nullcontext():
+        return func(*args, **(kwargs or {}))
@@ -0,0 +1,245 @@
+"""
+WebSocket Handler Module
+Valgfri asyncio-server som eksponerer DataStore over JSON-RPC 2.0 på WebSocket, på en egen port
+ved siden av XML-RPC-serveren (4840, som UR-kontrolleren fortsatt bruker).
+
+Hovedfunksjoner:
+- Samme metoder som XML-RPC: kallene går gjennom XML-RPC-serverens dispatcher (samme registrering).
+- Abonnement på navngitte felt: {"method": "subscribe", "params": [["UR_JOB", "UR_SORTING_RAMP"]]}
+  gir nåverdiene tilbake, og senere endringer pushes som notifikasjon:
+  {"jsonrpc": "2.0", "method": "changed", "params": {"version": v, "values": {felt: verdi}}}.
+- Én event-loop for alle klienter; blokkerende DataStore-kall kjøres i en begrenset trådpool.
+- Én overvåker venter på endringer (DataStore.wait_for_change) for alle klienter samlet.
+  Trege klienter får endringene slått sammen i stedet for en voksende kø.
+
+Krever pakken `websockets`; mangler den, logges en advarsel og serveren startes ikke.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Set
+from xmlrpc.client import Fault
+from handlers.rpc_dispatch import MethodNotFound, call_method, json_default
+from store.SharedDataStore import DataStore, FIELDS
+
+try:
+    import websockets
+except ImportError:   # Valgfri avhengighet
+    websockets = None
+
+WS_PORT = int(os.getenv("WS_PORT", "0"))                     # 0 = WebSocket-serveren er av
+WS_RPC_WORKERS = int(os.getenv("WS_RPC_WORKERS", "8"))       # Tråder for blokkerende DataStore-kall
+WS_MAX_MESSAGE = 1 << 20                                     # Maks meldingsstørrelse (byte)
+WATCH_TIMEOUT = 30.0                                         # Sekunder per wait_for_change-runde
+
+# JSON-RPC 2.0 feilkoder
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+SERVER_ERROR = -32000
+
+logger = logging.getLogger(__name__)
+
+
+class RpcError(Exception):
+    def __init__(self, code: int, message: str) -> None:
+        super().__init__(message)
+        self.code = code
+
+
+def _dumps(obj: Any) -> str:
+    return json.dumps(obj, default=json_default, ensure_ascii=False)
+
+
+class _Client:
+    """Én tilkoblet klient: abonnerte felt og endringer som venter på å bli sendt."""
+    __slots__ = ("ws", "fields", "pending", "version", "wakeup", "tasks")
+
+    def __init__(self, ws: Any) -> None:
+        self.ws = ws
+        self.fields: Set[str] = set()
+        self.pending: Dict[str, Any] = {}
+        self.version = 0
+        self.wakeup = asyncio.Event()
+        self.tasks: Set[asyncio.Task] = set()
+
+
+class JsonRpcWebSocketServer:
+    def __init__(self, dispatcher: Any, data_store: DataStore,
+                 host: str = "0.0.0.0", port: int = WS_PORT, workers: int = WS_RPC_WORKERS) -> None:
+        self.dispatcher = dispatcher
+        self.data_store = data_store
+        self.host = host
+        self.port = port
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="WS-RPC")
+        self._watcher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="WS-Watch")
+        self._clients: Set[_Client] = set()
+
+    # ---------- Server ----------
+    async def serve(self) -> None:
+        async with websockets.serve(self._connection, self.host, self.port, max_size=WS_MAX_MESSAGE):
+            logger.info("JSON-RPC/WebSocket-server lytter på %s:%d", self.host, self.port)
+            await self._watch()
+
+    async def _connection(self, ws: Any, *_: Any) -> None:
+        client = _Client(ws)
+        self._clients.add(client)
+        sender = asyncio.create_task(self._sender(client))
+        try:
+            async for message in ws:
+                task = asyncio.create_task(self._respond(client, message))
+                client.tasks.add(task)
+                task.add_done_callback(client.tasks.discard)
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            self._clients.discard(client)
+            sender.cancel()
+            for task in list(client.tasks):
+                task.cancel()
+
+    async def _sender(self, client: _Client) -> None:
+        """Sender sammenslåtte endringer; nye endringer mens vi sender havner i neste melding."""
+        try:
+            while True:
+                await client.wakeup.wait()
+                client.wakeup.clear()
+                values, client.pending = client.pending, {}
+                if values:
+                    await client.ws.send(_dumps({
+                        "jsonrpc": "2.0",
+                        "method": "changed",
+                        "params": {"version": client.version, "values": values},
+                    }))
+        except websockets.ConnectionClosed:
+            pass
+
+    # ---------- Endringer ----------
+    async def _watch(self) -> None:
+        loop = asyncio.get_running_loop()
+        version = self.data_store.get_version()
+        while True:
+            try:
+                result = await loop.run_in_executor(
+                    self._watcher, self.data_store.wait_for_change, None, version, WATCH_TIMEOUT)
+            except Exception:
+                logger.exception("Feil i endringsovervåkeren")
+                await asyncio.sleep(1.0)
+                continue
+            version = result["version"]
+            if result["changed"]:
+                self._broadcast(version, {k: result["values"][k] for k in result["changed"]})
+
+    def _broadcast(self, version: int, values: Dict[str, Any]) -> None:
+        for client in self._clients:
+            selected = {k: v for k, v in values.items() if k in client.fields}
+            if selected:
+                client.pending.update(selected)
+                client.version = version
+                client.wakeup.set()
+
+    # ---------- JSON-RPC ----------
+    async def _respond(self, client: _Client, message: Any) -> None:
+        try:
+            request = json.loads(message)
+        except (TypeError, ValueError):
+            reply: Any = self._error(None, PARSE_ERROR, "Ugyldig JSON")
+        else:
+            if isinstance(request, list):   # Batch
+                replies = await asyncio.gather(*(self._call(client, r) for r in request))
+                reply = [r for r in replies if r is not None] or None
+            else:
+                reply = await self._call(client, request)
+        if reply is not None:
+            try:
+                await client.ws.send(_dumps(reply))
+            except websockets.ConnectionClosed:
+                pass
+
+    async def _call(self, client: _Client, request: Any) -> Optional[Dict[str, Any]]:
+        if not isinstance(request, dict) or not isinstance(request.get("method"), str):
+            return self._error(None, INVALID_REQUEST, "Ugyldig forespørsel")
+        req_id = request.get("id")
+        method = request["method"]
+        params = request.get("params", [])
+        try:
+            if not isinstance(params, (list, dict)):
+                raise RpcError(INVALID_PARAMS, "params må være liste eller objekt")
+            if method == "subscribe":
+                result = self._subscribe(client, *self._args(params, "fields"))
+            elif method == "unsubscribe":
+                result = self._unsubscribe(client, *self._args(params, "fields"))
+            else:
+                loop = asyncio.get_running_loop()
+                result = await loop.run_in_executor(self._executor, self._invoke, method, params)
+        except RpcError as e:
+            return self._error(req_id, e.code, str(e))
+        except Fault as e:
+            return self._error(req_id, e.faultCode, e.faultString)
+        except Exception as e:
+            return self._error(req_id, SERVER_ERROR, f"{type(e).__name__}: {e}")
+        if "id" not in request:
+            return None   # Notifikasjon – ingen svar
+        return {"jsonrpc": "2.0", "id": req_id, "result": result}
+
+    @staticmethod
+    def _args(params: Any, name: str) -> List[Any]:
+        if isinstance(params, dict):
+            return [params[name]] if name in params else []
+        return list(params)
+
+    def _invoke(self, method: str, params: Any) -> Any:
+        """Kjøres i trådpoolen. Posisjonelle eller navngitte parametre (handlers/rpc_dispatch.py)."""
+        try:
+            if isinstance(params, list):
+                return call_method(self.dispatcher, method, params)
+            try:
+                return call_method(self.dispatcher, method, kwargs=params)
+            except TypeError as e:
+                raise RpcError(INVALID_PARAMS, str(e))
+        except MethodNotFound as e:
+            raise RpcError(METHOD_NOT_FOUND, str(e))
+
+    def _subscribe(self, client: _Client, fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Abonner på felt (alle hvis tom); returnerer versjon og nåverdier for feltene."""
+        wanted = list(fields) if fields else list(FIELDS)
+        unknown = [f for f in wanted if f not in FIELDS]
+        if unknown:
+            raise RpcError(INVALID_PARAMS, f"Ukjente felt: {unknown}")
+        client.fields.update(wanted)
+        snapshot = self.data_store.get_snapshot()
+        return {
+            "version": snapshot["version"],
+            "values": {f: snapshot["values"][f] for f in wanted},
+        }
+
+    def _unsubscribe(self, client: _Client, fields: Optional[List[str]] = None) -> List[str]:
+        """Avslutt abonnement på felt (alle hvis tom); returnerer feltene som fortsatt abonneres."""
+        if fields:
+            client.fields.difference_update(fields)
+        else:
+            client.fields.clear()
+        return sorted(client.fields)
+
+    @staticmethod
+    def _error(req_id: Any, code: int, message: str) -> Dict[str, Any]:
+        return {"jsonrpc": "2.0", "id": req_id, "error": {"code": code, "message": message}}
+
+
+def start_ws_server(dispatcher: Any, data_store: DataStore,
+                    host: str = "0.0.0.0", port: int = WS_PORT) -> Optional[threading.Thread]:
+    """Start WebSocket-serveren i egen tråd med egen event-loop. Returnerer None hvis den er av."""
+    if port <= 0:
+        return None
+    if websockets is None:
+        logger.warning("WS_PORT=%d er satt, men pakken 'websockets' mangler – WebSocket-serveren startes ikke.", port)
+        return None
+    server = JsonRpcWebSocketServer(dispatcher, data_store, host, port)
+    thread = threading.Thread(target=asyncio.run, args=(server.serve(),), name="WS-Server-Thread", daemon=True)
+    thread.start()
+    return thread
@@ -6,17 +6,37 @@ Det bruker threading for å kjøre serveren og PLC-jobben parallelt, og logger h
 Det er designet for å kjøre i en container, og kan enkelt deaktiveres for testing uten tilkoblet PLC eller UR5-robot.
 """
 
+import os
+import queue
+import select
 import signal
 import threading
 import time
+import xmlrpc.client
+from contextlib import contextmanager
 from socketserver import ThreadingMixIn
-from xmlrpc.server import SimpleXMLRPCServer
-from store.SharedDataStore import DataStore
+from typing import Any, Dict, Iterator
+from xmlrpc.client import gzip_encode
+from xmlrpc.server import SimpleXMLRPCRequestHandler, SimpleXMLRPCServer
+from store.SharedDataStore import DataStore, CACHEABLE_READS
 from handlers.plc_handler import plc_job
+from handlers.ws_handler import start_ws_server, WS_PORT
+from handlers.binrpc_handler import start_binary_server, BIN_PORT
+from handlers.response_cache import ResponseCache, RPC_CACHE_SIZE
 import logging
 
 DISABLED_CONTAINER = True # Deaktiver hvis PLC eller UR5-robot ikke er i bruk
 
+RPC_WORKERS        = int(os.getenv("RPC_WORKERS", "8"))          # Faste arbeidertråder (0 = én tråd per tilkobling)
+RPC_QUEUE_SIZE     = int(os.getenv("RPC_QUEUE_SIZE", "32"))      # Tilkoblinger som kan vente på en arbeider
+RPC_CLIENT_TIMEOUT = float(os.getenv("RPC_CLIENT_TIMEOUT", "30"))  # Sekunder en treg klient får holde en arbeider
+RPC_BUSY_FAULT     = -32000                                        # Fault-kode når køen er full
+RPC_KEEPALIVE_IDLE = float(os.getenv("RPC_KEEPALIVE_IDLE", "5"))   # Sekunder en ledig keep-alive-tilkobling holdes åpen
+RPC_KEEPALIVE_MAX  = int(os.getenv("RPC_KEEPALIVE_MAX", "100"))    # Maks forespørsler per tilkobling
+RPC_KEEPALIVE_POLL = 0.1                                           # Sekunder mellom sjekk av ventende tilkoblinger
+RPC_MAX_LONG_POLLS = int(os.getenv("RPC_MAX_LONG_POLLS", str(max(1, RPC_WORKERS // 2))))  # Samtidige wait_for_change
+LONG_POLL_METHODS  = frozenset({"wait_for_change"})                # Kall som kan holde en arbeider i opptil 30 s
+
 # ---------------------------------------------------------------------------
 # 1. Logger-konfigurasjon
 logging.basicConfig(
@@ -29,21 +49,287 @@ logger = logging.getLogger(__name__)
 # ---------------------------------------------------------------------------
 # 2. Threaded XML-RPC-server
 # ---------------------------------------------------------------------------
+class RequestHandler(SimpleXMLRPCRequestHandler):
+    """
+    HTTP/1.1 med keep-alive, så en klient kan sende mange kall over samme socket.
+    • Tidsavbrudd (RPC_CLIENT_TIMEOUT) mens en forespørsel leses, så en treg klient ikke holder en tråd.
+    • Før hver forespørsel – også den første på en ny tilkobling – ventes det med select i
+      RPC_KEEPALIVE_POLL-intervaller. Tilkoblingen lukkes etter RPC_KEEPALIVE_IDLE sekunder uten
+      trafikk, etter RPC_KEEPALIVE_MAX forespørsler, eller etter ett intervall uten data hvis andre
+      tilkoblinger venter på en arbeider. En tilkobling som ikke har begynt å sende en forespørsel
+      holder dermed ikke en arbeider mens andre står i kø; en forespørsel som er påbegynt har
+      fortsatt RPC_CLIENT_TIMEOUT.
+    • Har serveren en svarcache (response_cache), hentes svar på polte lesemetoder derfra og får
+      en ETag; sender klienten den i If-None-Match og ingenting er endret, svares 304 uten innhold.
+    """
+    protocol_version = "HTTP/1.1"
+    timeout = RPC_CLIENT_TIMEOUT
+
+    def setup(self) -> None:
+        super().setup()
+        self.requests_served = 0
+
+    def handle_one_request(self) -> None:
+        if not self._wait_for_next_request():
+            self.close_connection = True
+            return
+        super().handle_one_request()
+
+    def _wait_for_next_request(self) -> bool:
+        """
+        Vent på neste forespørsel i korte intervaller (select) i stedet for å blokkere i readline,
+        så tilkoblingen kan gis opp når andre venter. Hvert intervall gis klienten først sjansen
+        til å sende (data underveis rett etter connect), deretter sjekkes køen. False: lukk.
+        """
+        waiting = getattr(self.server, "waiting", lambda: 0)
+        deadline = time.monotonic() + RPC_KEEPALIVE_IDLE
+        try:
+            self.connection.settimeout(0)
+            if self.rfile.peek(1):
+                return True   # Neste forespørsel ligger allerede i lesebufferen
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                readable, _, _ = select.select([self.connection], [], [], min(remaining, RPC_KEEPALIVE_POLL))
+                if readable:
+                    return True   # Data eller lukket av klienten – handle_one_request finner ut hvilken
+                if waiting():
+                    return False
+        finally:
+            self.connection.settimeout(self.timeout)
+
+    def end_headers(self) -> None:
+        self.requests_served += 1
+        if self.requests_served >= RPC_KEEPALIVE_MAX:
+            self.send_header("Connection", "close")
+        super().end_headers()
+
+    def do_POST(self) -> None:
+        cache = getattr(self.server, "response_cache", None)
+        if cache is None or not self.is_rpc_path_valid():
+            super().do_POST()
+            return
+        try:
+            data = self.decode_request_content(self.rfile.read(int(self.headers["content-length"])))
+            if data is None:
+                return   # Feilsvar er allerede sendt
+            etag, response = cache.respond(data, self.server._marshaled_dispatch,
+                                           self.headers.get("If-None-Match"))
+        except Exception:
+            logger.exception("Feil ved behandling av XML-RPC-forespørsel")
+            self.send_response(500)
+            self.send_header("Content-length", "0")
+            self.end_headers()
+            return
+
+        if response is None:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-type", "text/xml")
+        if etag is not None:
+            self.send_header("ETag", etag)
+        if (self.encode_threshold is not None and len(response) > self.encode_threshold
+                and self.accept_encodings().get("gzip", 0)):
+            response = gzip_encode(response)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-length", str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_error(self, format: str, *args: Any) -> None:
+        # Protokollfeil (400, tidsavbrudd midt i en forespørsel) til loggen i stedet for stderr.
+        # Ledige keep-alive-tilkoblinger lukkes i _wait_for_next_request og havner ikke her.
+        logger.warning("%s - %s", self.address_string(), format % args)
+
+
 class ThreadedXMLRPCServer(ThreadingMixIn, SimpleXMLRPCServer):
     """Hver klientforbindelse kjøres i egen tråd."""
     daemon_threads = True        # Avslutt klienttråder på shutdown
     allow_reuse_address = True   # Gjenbruk port raskt etter restart
 
 
+class PooledXMLRPCServer(SimpleXMLRPCServer):
+    """
+    Fast antall arbeidertråder og begrenset kø i stedet for én tråd per tilkobling.
+    • Accept-tråden legger tilkoblingen i køen; arbeiderne henter og behandler den.
+    • Er køen full, får klienten en "busy"-fault (RPC_BUSY_FAULT) fra én egen avvisningstråd –
+      trådantallet (og GIL-konkurransen med plc_job) er dermed begrenset uansett belastning.
+    • Long-poll-kall (LONG_POLL_METHODS) begrenses til færre enn antall arbeidere, så de aldri kan
+      oppta hele poolen; over grensen får klienten busy-fault og prøver igjen.
+    """
+    allow_reuse_address = True   # Gjenbruk port raskt etter restart
+
+    def __init__(self, addr, workers: int = RPC_WORKERS, queue_size: int = RPC_QUEUE_SIZE,
+                 max_long_polls: int = RPC_MAX_LONG_POLLS, **kwargs: Any) -> None:
+        super().__init__(addr, **kwargs)
+        self.workers = workers
+        self.max_long_polls = max(1, min(max_long_polls, workers - 1))   # Minst én arbeider holdes ledig
+        self._long_polls = threading.BoundedSemaphore(self.max_long_polls)
+        self.long_polls = 0
+        self.long_polls_rejected = 0
+        self._requests: "queue.Queue[Any]" = queue.Queue(maxsize=queue_size)
+        self._rejects: "queue.Queue[Any]" = queue.Queue(maxsize=queue_size)
+        self._stats_lock = threading.Lock()
+        self.handled = 0
+        self.rejected = 0
+        self._busy_response = xmlrpc.client.dumps(
+            xmlrpc.client.Fault(RPC_BUSY_FAULT, "Serveren er opptatt, prøv igjen"),
+            methodresponse=True,
+        ).encode()
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"XMLRPC-Worker-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        self._threads.append(threading.Thread(target=self._rejecter, name="XMLRPC-Rejecter", daemon=True))
+        for t in self._threads:
+            t.start()
+
+    def process_request(self, request, client_address) -> None:
+        try:
+            self._requests.put_nowait((request, client_address))
+        except queue.Full:
+            with self._stats_lock:
+                self.rejected += 1
+            try:
+                self._rejects.put_nowait(request)
+            except queue.Full:
+                self.shutdown_request(request)   # Også avvisningskøen er full – bare lukk
+
+    def _rejecter(self) -> None:
+        while True:
+            request = self._rejects.get()
+            if request is None:
+                return
+            try:
+                self._reject_busy(request)
+            finally:
+                self.shutdown_request(request)
+
+    def _reject_busy(self, request) -> None:
+        """Les hele forespørselen (ellers får klienten RST/broken pipe) og svar med busy-fault."""
+        try:
+            request.settimeout(1.0)
+            rfile = request.makefile("rb")
+            length = 0
+            while True:
+                line = rfile.readline(65537)
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.partition(b":")
+                if name.strip().lower() == b"content-length":
+                    length = int(value.strip() or 0)
+            rfile.read(min(length, 10 * 1024 * 1024))
+            rfile.close()
+            request.sendall(
+                b"HTTP/1.0 200 OK\r\nContent-Type: text/xml\r\nConnection: close\r\n"
+                + f"Content-Length: {len(self._busy_response)}\r\n\r\n".encode()
+                + self._busy_response
+            )
+        except (OSError, ValueError):
+            pass
+
+    def _worker(self) -> None:
+        while True:
+            item = self._requests.get()
+            if item is None:
+                return
+            request, client_address = item
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+                with self._stats_lock:
+                    self.handled += 1
+
+    def _dispatch(self, method: str, params: Any) -> Any:
+        with self.long_poll_slot(method):
+            return super()._dispatch(method, params)
+
+    @contextmanager
+    def long_poll_slot(self, method: str) -> Iterator[None]:
+        """
+        Plass for et kall til `method` hvis det er et long-poll-kall, ellers ingenting.
+        Brukes av _dispatch og av transportene som kaller metoden direkte (navngitte parametre
+        over WebSocket), så grensen gjelder samme hvor kallet kommer fra.
+        """
+        if method not in LONG_POLL_METHODS:
+            yield
+            return
+        if not self._long_polls.acquire(blocking=False):
+            with self._stats_lock:
+                self.long_polls_rejected += 1
+            raise xmlrpc.client.Fault(RPC_BUSY_FAULT, "For mange samtidige long-poll-kall, prøv igjen")
+        with self._stats_lock:
+            self.long_polls += 1
+        try:
+            yield
+        finally:
+            with self._stats_lock:
+                self.long_polls -= 1
+            self._long_polls.release()
+
+    def waiting(self) -> int:
+        """Tilkoblinger i køen som venter på en ledig arbeider."""
+        return self._requests.qsize()
+
+    def get_rpc_stats(self) -> Dict[str, int]:
+        """Kødybde og tellere for overvåking (registrert som RPC-metode)."""
+        with self._stats_lock:
+            return {
+                "workers": self.workers,
+                "queue_depth": self._requests.qsize(),
+                "queue_size": self._requests.maxsize,
+                "handled": self.handled,
+                "rejected": self.rejected,
+                "long_polls": self.long_polls,
+                "max_long_polls": self.max_long_polls,
+                "long_polls_rejected": self.long_polls_rejected,
+            }
+
+    def server_close(self) -> None:
+        super().server_close()
+        for _ in range(self.workers):
+            self._requests.put(None)
+        self._rejects.put(None)
+
+
 def create_server(dataStore: DataStore,
                   host: str = "0.0.0.0",
-                  port: int = 4840) -> ThreadedXMLRPCServer:
-    """Oppretter, registrerer DataStore og returnerer serverobjektet."""
-    server = ThreadedXMLRPCServer((host, port),
-                                  logRequests=False,
-                                  allow_none=True)
+                  port: int = 4840,
+                  workers: int = RPC_WORKERS,
+                  queue_size: int = RPC_QUEUE_SIZE) -> SimpleXMLRPCServer:
+    """
+    Oppretter, registrerer DataStore og returnerer serverobjektet.
+    workers > 0 gir fast arbeiderpool med begrenset kø; workers = 0 gir én tråd per tilkobling.
+    """
+    server: SimpleXMLRPCServer
+    if workers > 0:
+        server = PooledXMLRPCServer((host, port),
+                                    workers=workers,
+                                    queue_size=queue_size,
+                                    requestHandler=RequestHandler,
+                                    logRequests=False,
+                                    allow_none=True)
+        server.register_function(server.get_rpc_stats, "get_rpc_stats")
+    else:
+        server = ThreadedXMLRPCServer((host, port),
+                                      requestHandler=RequestHandler,
+                                      logRequests=False,
+                                      allow_none=True)
     server.register_instance(dataStore, allow_dotted_names=True)
-    logger.info("XML-RPC-server lytter på %s:%d", host, port)
+    read_version = getattr(dataStore, "get_read_version", None)
+    if read_version is not None and RPC_CACHE_SIZE > 0:
+        # Ferdig kodede svar for polte lesemetoder, versjonert per felt/rack
+        server.response_cache = ResponseCache(read_version, [*CACHEABLE_READS, "get_rack_contents"])
+        server.register_function(server.response_cache.get_stats, "get_rpc_cache_stats")
+    server.register_multicall_functions()   # system.multicall: mange kall i én forespørsel
+    logger.info("XML-RPC-server lytter på %s:%d (arbeidere=%d, kø=%d)", host, port, workers, queue_size)
     return server
 
 def logger_thread(ds: DataStore):
@@ -102,13 +388,19 @@ def main() -> None:
     )
     server_thread.start()
 
+    # Valgfri JSON-RPC/WebSocket-server (WS_PORT) med samme metoder og push av endringer
+    start_ws_server(server, data, port=WS_PORT)
+    # Valgfri binær RPC (BIN_PORT) med pipelining for robotklienter som poller ofte
+    start_binary_server(server, port=BIN_PORT)
+
 
     def shutdown_handler(sig, frame):
-        logger.info("\n[MAIN] SIGINT mottatt - stenger serveren …")
+        logger.info("\n[MAIN] Avslutningssignal mottatt - stenger serveren …")
         server.shutdown()
         server.server_close()
 
     signal.signal(signal.SIGINT, shutdown_handler) # Håndter Ctrl-C for å stoppe serveren
+    signal.signal(signal.SIGTERM, shutdown_handler) # docker stop / Kubernetes
 
     try:
         logger.info("Trykk Ctrl-C for å avslutte.")
@@ -121,6 +413,7 @@ def main() -> None:
     finally:
         logger.info("[MAIN] Venter på servertråden …")
         server_thread.join()
+        data.db_handler.close()   # Skriv ventende timesaggregater før avslutning
         logger.info("[MAIN] Ferdig. Prosessen avsluttes.")
 
 
@@ -3,6 +3,12 @@ db_com.py
 • Kommunikasjon med MySQL-database via mysql-connector-python.
 • Støtter CRUD-operasjoner for ulike tabeller.
 • Bruker miljøvariabler for database-tilkobling.
+• Trådsikker, begrenset tilkoblingspool (ConnectionPool) med helsesjekk og gjenoppkobling.
+• LRU/TTL-cache (LookupCache) foran matrix→sample_type og sample_type→RFID.
+• Versjonerte skjemamigrasjoner (MIGRATIONS + schema_version-tabell).
+• Spørringsregister (QUERIES) med server-side prepared statements per pool-tilkobling.
+• Plasseringshistorikk i månedspartisjonert rack_slot_history; tømming = arkivering + TRUNCATE.
+• Timesaggregater for dashbordet (placement_stats_hourly), oppdatert ved hver plassering.
 • Feilhåndtering for databaseoperasjoner.
 • Eksempel på bruk:
     db = DBSample()
@@ -12,9 +18,16 @@ db_com.py
 """
 
 import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
 import mysql.connector
 from mysql.connector.cursor import MySQLCursorDict
-from typing import Any, Dict, List, Optional, cast
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Tuple, cast
+from middleware.throughput import ThroughputRollup, merge_rows
 
 DEBUG_MATRIX_CODES = [
     "1001, 1002, 1003, 1004, 1005, 1006, 1007, 1008, 1009, 1010",
@@ -37,6 +50,18 @@ DB_USER  = os.getenv("DB_USER",  "user")
 DB_PASS  = os.getenv("DB_PASSWORD", "")
 DB_NAME  = os.getenv("DB_NAME",  "mydb")
 POLL_MS  = int(os.getenv("POLL_MS", "200"))
+DB_POOL_SIZE    = int(os.getenv("DB_POOL_SIZE", "5"))          # Maks antall samtidige tilkoblinger
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))    # Sekunder å vente på ledig tilkobling
+DB_POOL_PING_S  = float(os.getenv("DB_POOL_PING_S", "30"))     # Ping tilkoblinger som har vært ledige lenger enn dette
+DB_PREPARED     = os.getenv("DB_PREPARED", "0") == "1"         # Server-side prepared statements for QUERIES (se under)
+DB_PLACE_RETRIES = int(os.getenv("DB_PLACE_RETRIES", "5"))     # Nye forsøk ved kollisjon på samme posisjon
+DB_CACHE_SIZE   = int(os.getenv("DB_CACHE_SIZE", "4096"))      # Maks antall oppslag per cache
+DB_CACHE_TTL_S  = float(os.getenv("DB_CACHE_TTL_S", "60"))     # Levetid for et cachet oppslag
+HISTORY_RETENTION_MONTHS = int(os.getenv("HISTORY_RETENTION_MONTHS", "0"))  # 0 = behold all historikk
+HISTORY_MAX_PAGE_SIZE = 1000
+STATS_FLUSH_S = float(os.getenv("STATS_FLUSH_S", "30"))   # Hvor ofte timesaggregatene skrives til DB (bakgrunnstråd)
+STATS_MAX_HOURS = 24 * 31
+HISTORY_MAINTENANCE_S = 3600                              # Hvor ofte historikkpartisjonene vedlikeholdes
 
 # --------------------------------------------------
 # Tabellnavn
@@ -45,6 +70,8 @@ TABLE_SAMPLE_TYPE = "sample_type"
 TABLE_SAMPLE      = "sample"
 TABLE_RACK        = "rack"
 TABLE_RACK_SLOT   = "rack_slot"
+TABLE_RACK_SLOT_HISTORY = "rack_slot_history"
+TABLE_PLACEMENT_STATS = "placement_stats_hourly"
 
 # --------------------------------------------------
 # DDL-maler
@@ -87,12 +114,143 @@ TEMPLATE_RACK_SLOT = {
     "columns": {
         "id":        "INT AUTO_INCREMENT PRIMARY KEY",
         "rack_id":   "INT NOT NULL", # ID til skinne (fremmednøkkel)
-        "position":  "TINYINT NOT NULL",      # 1–10
+        "position":  "TINYINT NOT NULL",      # 1–RAIL_LENGTH
         "sample_id": "INT NOT NULL", # ID til sample (fremmednøkkel)
         "placed_at": "DATETIME DEFAULT CURRENT_TIMESTAMP",
     }
 }
 
+# --------------------------------------------------
+# SQL-spørringer
+# --------------------------------------------------
+# Spørringsregister for de hyppige oppslagene: navn → SQL. Tabellnavnene flettes inn her, ikke per kall.
+# Standard er tekstprotokoll: én rundtur per oppslag. Med DB_PREPARED=1 forberedes hver spørring én gang
+# per pool-tilkobling (COM_STMT_PREPARE) og kjøres med binærprotokollen – men mysql-connector sender
+# COM_STMT_RESET før hver kjøring, så det koster en ekstra rundtur. Det lønner seg bare når parsing på
+# serveren koster mer enn en rundtur, noe robotens korte oppslag ikke gjør.
+QUERIES: Dict[str, str] = {
+    "sample_by_matrix":      f"SELECT sample_type, sample_taken_time FROM {TABLE_SAMPLE} WHERE matrix = %s LIMIT 1",
+    "rfid_by_sample_type":   f"SELECT rfid FROM {TABLE_RACK} WHERE sample_type = %s LIMIT 1",
+    "insert_sample_at":      f"""INSERT INTO {TABLE_RACK_SLOT} (rack_id, position, sample_id)
+                                 SELECT %s, %s, id FROM {TABLE_SAMPLE} WHERE matrix = %s LIMIT 1""",
+    "rack_occupancy":        f"""SELECT r.rfid, r.id AS rack_id, rs.position
+                                 FROM {TABLE_RACK} r
+                                 LEFT JOIN {TABLE_RACK_SLOT} rs ON rs.rack_id = r.id
+                                 WHERE r.rfid = %s""",
+    "rack_contents":         f"""SELECT
+                                     rs.position,
+                                     s.id   AS sample_id,
+                                     s.matrix,
+                                     st.name AS sample_test_type,
+                                     s.sample_taken_time
+                                 FROM {TABLE_RACK}   r
+                                 LEFT JOIN {TABLE_RACK_SLOT} rs ON r.id = rs.rack_id
+                                 LEFT JOIN {TABLE_SAMPLE}     s ON rs.sample_id = s.id
+                                 LEFT JOIN {TABLE_SAMPLE_TYPE} st ON s.sample_type = st.id
+                                 WHERE r.rfid = %s
+                                 ORDER BY rs.position""",
+}
+
+ER_DUP_ENTRY = 1062
+# Samtidig partisjonsvedlikehold: partisjonen finnes allerede (1517), grensene er allerede
+# delt opp (1493), eller partisjonen er allerede droppet (1507)
+PARTITION_RACE_ERRNOS = {1493, 1507, 1517}
+
+# --------------------------------------------------
+# Skjemamigrasjoner
+# --------------------------------------------------
+TABLE_SCHEMA_VERSION = "schema_version"
+MIGRATION_LOCK = "sample_schema_migration"
+MIGRATION_LOCK_TIMEOUT_S = 30
+
+# 1050: tabell finnes, 1061: duplikat nøkkelnavn, 1826: duplikat fremmednøkkel
+ALREADY_EXISTS_ERRNOS = {1050, 1061, 1826}
+
+def _ddl(template: Dict[str, Any]) -> str:
+    cols = ", ".join(f"{col} {dtype}" for col, dtype in template["columns"].items())
+    return f"CREATE TABLE IF NOT EXISTS {template['name']} ({cols})"
+
+# (versjon, navn, setninger) – bare legg til nye på slutten, aldri endre brukte
+MIGRATIONS: List[Tuple[int, str, List[str]]] = [
+    (1, "tabeller", [
+        _ddl(TEMPLATE_SAMPLE_TYPE),
+        _ddl(TEMPLATE_SAMPLE),
+        _ddl(TEMPLATE_RACK),
+        _ddl(TEMPLATE_RACK_SLOT),
+    ]),
+    (2, "fremmednøkler og unike begrensninger", [
+        # sample → sample_type
+        f"""ALTER TABLE {TABLE_SAMPLE}
+            ADD CONSTRAINT fk_sample_type
+            FOREIGN KEY (sample_type) REFERENCES {TABLE_SAMPLE_TYPE}(id)""",
+
+        # rack → sample_type
+        f"""ALTER TABLE {TABLE_RACK}
+            ADD CONSTRAINT fk_rack_type
+            FOREIGN KEY (sample_type) REFERENCES {TABLE_SAMPLE_TYPE}(id)""",
+
+        # rack_slot → rack
+        f"""ALTER TABLE {TABLE_RACK_SLOT}
+            ADD CONSTRAINT fk_rs_rack
+            FOREIGN KEY (rack_id) REFERENCES {TABLE_RACK}(id)
+            ON DELETE CASCADE""",
+
+        # rack_slot → sample
+        f"""ALTER TABLE {TABLE_RACK_SLOT}
+            ADD CONSTRAINT fk_rs_sample
+            FOREIGN KEY (sample_id) REFERENCES {TABLE_SAMPLE}(id)
+            ON DELETE CASCADE""",
+
+        # unike begrensninger
+        f"""ALTER TABLE {TABLE_RACK_SLOT}
+            ADD CONSTRAINT uq_rack_pos
+            UNIQUE (rack_id, position)""",
+        f"""ALTER TABLE {TABLE_RACK_SLOT}
+            ADD CONSTRAINT uq_sample_once
+            UNIQUE (sample_id)""",
+    ]),
+    (3, "indekser for matrix- og sample_type-oppslag", [
+        # Dekkende indekser: get_sample_type_by_matrix / get_rfid_by_sample_type leser bare indeksen
+        f"CREATE INDEX idx_sample_matrix ON {TABLE_SAMPLE} (matrix, sample_type)",
+        f"CREATE INDEX idx_rack_type_rfid ON {TABLE_RACK} (sample_type, rfid)",
+    ]),
+    (4, "plasseringshistorikk partisjonert på måned", [
+        # Uten fremmednøkler (støttes ikke i partisjonerte tabeller) – rfid og matrix lagres derfor
+        # sammen med id-ene, så historikken overlever at rack/prøver slettes.
+        # Månedspartisjoner legges til fortløpende av _ensure_history_partitions().
+        f"""CREATE TABLE IF NOT EXISTS {TABLE_RACK_SLOT_HISTORY} (
+            id         BIGINT AUTO_INCREMENT,
+            rack_id    INT NOT NULL,
+            rack_rfid  CHAR(24) DEFAULT NULL,
+            position   TINYINT NOT NULL,
+            sample_id  INT NOT NULL,
+            matrix     VARCHAR(255) DEFAULT NULL,
+            placed_at  DATETIME NOT NULL,
+            cleared_at DATETIME NOT NULL,
+            PRIMARY KEY (id, placed_at),
+            KEY idx_history_matrix (matrix),
+            KEY idx_history_rack (rack_rfid, placed_at)
+        )
+        PARTITION BY RANGE COLUMNS (placed_at) (
+            PARTITION p_archive VALUES LESS THAN ('2020-01-01'),
+            PARTITION p_future  VALUES LESS THAN (MAXVALUE)
+        )""",
+    ]),
+    (5, "timesaggregater for plasseringer", [
+        f"""CREATE TABLE IF NOT EXISTS {TABLE_PLACEMENT_STATS} (
+            hour         DATETIME NOT NULL,
+            sample_type  INT NOT NULL,
+            placements   INT NOT NULL DEFAULT 0,
+            wait_s_total DOUBLE NOT NULL DEFAULT 0,   -- sum av (plassert − sample_taken_time)
+            wait_s_max   DOUBLE NOT NULL DEFAULT 0,
+            PRIMARY KEY (hour, sample_type)
+        )""",
+        # Matrix-oppslaget henter nå også sample_taken_time – hold indeksen dekkende
+        f"""ALTER TABLE {TABLE_SAMPLE} DROP INDEX idx_sample_matrix,
+            ADD INDEX idx_sample_matrix (matrix, sample_type, sample_taken_time)""",
+    ]),
+]
+
 # --------------------------------------------------
 # Sample-type-konstanter (match tabellen)
 # --------------------------------------------------
@@ -100,247 +258,690 @@ SAMPLE_TYPE_YELLOW = 1
 SAMPLE_TYPE_GREEN  = 2
 SAMPLE_TYPE_GG     = 3
 
+# --------------------------------------------------
+# Hjelpere
+# --------------------------------------------------
+class PositionTakenError(Exception):
+    """Posisjonen er allerede opptatt i databasen (uq_rack_pos) – minnekopien er utdatert."""
+
+
+def _add_months(d: date, months: int) -> date:
+    """Første dag i måneden `months` måneder fra d (d skal være den 1.)."""
+    total = d.year * 12 + d.month - 1 + months
+    return date(total // 12, total % 12 + 1, 1)
+
+
+def _partition_name(month: date) -> str:
+    return f"p{month.year:04d}{month.month:02d}"
+
+
+def _placeholders(values: Any) -> str:
+    """'%s, %s, …' for en IN-liste."""
+    return ", ".join(["%s"] * len(values))
+
+
+# --------------------------------------------------
+# Oppslagscache
+# --------------------------------------------------
+class LookupCache:
+    """
+    Liten trådsikker LRU-cache med TTL for read-through-oppslag.
+    • Bare funne verdier caches (None = ikke funnet), så nye rader blir synlige straks.
+    • Endringer gjort utenom DBSample (f.eks. backend) blir synlige etter TTL eller invalidate().
+    """
+    def __init__(self, maxsize: int = DB_CACHE_SIZE, ttl: float = DB_CACHE_TTL_S) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        value = loader()   # DB-kall uten lås
+        if value is not None:
+            with self._lock:
+                self._entries[key] = (value, now + self.ttl)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        """Fjern én nøkkel, eller alt hvis key er None."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+# --------------------------------------------------
+# Tilkoblingspool
+# --------------------------------------------------
+class ConnectionPool:
+    """
+    Begrenset, trådsikker pool av MySQL-tilkoblinger.
+    • Hver forespørsel låner en egen tilkobling (connection()), så samtidige RPC-er
+      ikke deler cursor/resultatsett.
+    • Maks `size` tilkoblinger; ved full pool venter man inntil `timeout` sekunder.
+    • Tilkoblinger som har vært ledige lenger enn `ping_after` pinges (med reconnect)
+      før bruk, slik at de overlever MySQL wait_timeout og omstart av databasen.
+    • Tilkoblinger som feiler med tilkoblingsfeil kastes i stedet for å legges tilbake.
+    • Holder én cursor per registrert spørring og tilkobling (statement()), forberedt hvis
+      `prepared`; de forkastes sammen med tilkoblingen eller når den er koblet opp på nytt (ny connection_id).
+    """
+    def __init__(self, size: int = DB_POOL_SIZE, timeout: float = DB_POOL_TIMEOUT,
+                 ping_after: float = DB_POOL_PING_S, prepared: bool = DB_PREPARED, **connect_args: Any) -> None:
+        self.size = size
+        self.prepared = prepared
+        self.timeout = timeout
+        self.ping_after = ping_after
+        self.connect_args = connect_args
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle: "queue.LifoQueue[tuple]" = queue.LifoQueue()
+        self._statements: Dict[int, tuple] = {}   # id(conn) → (connection_id, {navn: cursor})
+
+    def _new_connection(self):
+        return mysql.connector.connect(autocommit=True, **self.connect_args)
+
+    def _checkout(self):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise RuntimeError(f"Ingen ledig databasetilkobling etter {self.timeout} s (pool={self.size})")
+        try:
+            try:
+                conn, idle_since = self._idle.get_nowait()
+            except queue.Empty:
+                return self._new_connection()
+            # is_connected() sender selv COM_PING, så kun tilkoblinger som har ligget lenge pinges.
+            # Andre brutte tilkoblinger feiler ved bruk og kastes av connection().
+            if time.monotonic() - idle_since > self.ping_after:
+                conn.ping(reconnect=True, attempts=3, delay=1)
+            return conn
+        except Exception:
+            self._slots.release()
+            raise
+
+    def _checkin(self, conn, broken: bool) -> None:
+        try:
+            if broken:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+            else:
+                self._idle.put((conn, time.monotonic()))
+                return
+            self._statements.pop(id(conn), None)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        """Låner en tilkobling for varigheten av with-blokken."""
+        conn = self._checkout()
+        broken = False
+        try:
+            yield conn
+        except (mysql.connector.errors.OperationalError, mysql.connector.errors.InterfaceError):
+            broken = True
+            raise
+        finally:
+            self._checkin(conn, broken)
+
+    def statement(self, conn, name: str):
+        """Dictionary-cursor for QUERIES[name] på denne tilkoblingen (lages ved første bruk)."""
+        entry = self._statements.get(id(conn))
+        if entry is None or entry[0] != conn.connection_id:
+            entry = (conn.connection_id, {})   # Ny tilkobling, eller reconnect – server-statements er borte
+            self._statements[id(conn)] = entry
+        cursors = entry[1]
+        cursor = cursors.get(name)
+        if cursor is None:
+            cursor = cursors[name] = conn.cursor(prepared=self.prepared, dictionary=True)
+        return cursor
+
+    def close_all(self) -> None:
+        self._statements.clear()
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+
 # --------------------------------------------------
 # DB-klasse
 # --------------------------------------------------
 class DBSample:
     def __init__(self) -> None:
-        self.conn = mysql.connector.connect(
+        self.pool = ConnectionPool(
             host=DB_HOST,
             user=DB_USER,
             password=DB_PASS,
             database=DB_NAME,
         )
-        raw_cursor = self.conn.cursor(dictionary=True) # type: ignore
-        self.cursor: MySQLCursorDict = cast(MySQLCursorDict, raw_cursor)
+        self.sample_type_cache = LookupCache()   # matrix → {sample_type, sample_taken_time}
+        self.rack_rfid_cache = LookupCache()     # sample_type → rack-RFID
+        self.throughput = ThroughputRollup()
         self._create_schema()
-        self.clear_sorting_data()
+
+        # Bakgrunnstråd som skriver timesaggregatene (så de ikke venter på neste plassering) og
+        # vedlikeholder historikkpartisjonene – ingenting av dette gjøres mens DBSample opprettes
+        self._stop = threading.Event()
+        self._maintenance = threading.Thread(target=self._maintenance_loop, name="DB-Maintenance", daemon=True)
+        self._maintenance.start()
 
     # ---------- Generelt ----------
     def close(self) -> None:
-        self.conn.close()
+        """Stopp bakgrunnstråden, skriv ventende aggregater og lukk tilkoblingene (ved avslutning)."""
+        self._stop.set()
+        self.flush_throughput()
+        self.pool.close_all()
+
+    def _maintenance_loop(self) -> None:
+        next_partition_check = 0.0   # Første runde med en gang, deretter hver HISTORY_MAINTENANCE_S
+        while True:
+            if time.monotonic() >= next_partition_check:
+                try:
+                    self._maintain_history_partitions()
+                    next_partition_check = time.monotonic() + HISTORY_MAINTENANCE_S
+                except mysql.connector.errors.Error as err:
+                    print(f"Kunne ikke vedlikeholde historikkpartisjoner, prøver igjen senere: {err}")
+            if self._stop.wait(STATS_FLUSH_S):
+                return
+            try:
+                self.flush_throughput()
+            except mysql.connector.errors.Error as err:
+                print(f"Kunne ikke skrive timesaggregater, prøver igjen senere: {err}")
+
+    def invalidate_caches(self) -> None:
+        """Tøm oppslagscachene – kall etter at sample- eller rack-tabellene er endret."""
+        self.sample_type_cache.invalidate()
+        self.rack_rfid_cache.invalidate()
+
+    def get_cache_stats(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            "sample_type": self.sample_type_cache.stats(),
+            "rack_rfid": self.rack_rfid_cache.stats(),
+        }
 
-    # ---------- Skjemabygging ----------
-    def _ddl(self, template: Dict[str, Any]) -> str:
-        cols = ", ".join(f"{col} {dtype}" for col, dtype in template["columns"].items())
-        return f"CREATE TABLE IF NOT EXISTS {template['name']} ({cols})"
+    @contextmanager
+    def _cursor(self):
+        """Dictionary-cursor på en lånt tilkobling (autocommit, for enkeltspørringer)."""
+        with self.pool.connection() as conn:
+            cursor = cast(MySQLCursorDict, conn.cursor(dictionary=True)) # type: ignore
+            try:
+                yield cursor
+            finally:
+                cursor.close()
+
+    def _execute(self, conn, name: str, params: tuple):
+        """Kjør en registrert spørring på `conn` (prepared hvis DB_PREPARED); returnerer cursoren."""
+        cursor = self.pool.statement(conn, name)
+        cursor.execute(QUERIES[name], params)
+        return cursor
+
+    def _query(self, name: str, params: tuple) -> List[Dict[str, Any]]:
+        """Registrert SELECT på en lånt tilkobling; alle rader leses ut."""
+        with self.pool.connection() as conn:
+            return cast(List[Dict[str, Any]], self._execute(conn, name, params).fetchall())
+
+    @contextmanager
+    def _transaction(self):
+        """Dictionary-cursor i en transaksjon: commit ved suksess, rollback ved feil."""
+        with self.pool.connection() as conn:
+            cursor = cast(MySQLCursorDict, conn.cursor(dictionary=True)) # type: ignore
+            conn.start_transaction()
+            try:
+                yield cursor
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
 
+    # ---------- Skjemabygging ----------
     def _create_schema(self) -> None:
-        """Opprett alle tabeller + FK/indekser hvis de ikke finnes."""
-        # 1) Selve tabellene
-        for tmpl in (
-            TEMPLATE_SAMPLE_TYPE,
-            TEMPLATE_SAMPLE,
-            TEMPLATE_RACK,
-            TEMPLATE_RACK_SLOT,
-        ):
-            self.cursor.execute(self._ddl(tmpl))
-
-        # 2) Fremmednøkler og unike begrensninger
-        fk_statements = [
-            # sample → sample_type
-            f"""ALTER TABLE {TABLE_SAMPLE}
-                ADD CONSTRAINT fk_sample_type
-                FOREIGN KEY (sample_type) REFERENCES {TABLE_SAMPLE_TYPE}(id)""",
-
-            # rack → sample_type
-            f"""ALTER TABLE {TABLE_RACK}
-                ADD CONSTRAINT fk_rack_type
-                FOREIGN KEY (sample_type) REFERENCES {TABLE_SAMPLE_TYPE}(id)""",
-
-            # rack_slot → rack
-            f"""ALTER TABLE {TABLE_RACK_SLOT}
-                ADD CONSTRAINT fk_rs_rack
-                FOREIGN KEY (rack_id) REFERENCES {TABLE_RACK}(id)
-                ON DELETE CASCADE""",
-
-            # rack_slot → sample
-            f"""ALTER TABLE {TABLE_RACK_SLOT}
-                ADD CONSTRAINT fk_rs_sample
-                FOREIGN KEY (sample_id) REFERENCES {TABLE_SAMPLE}(id)
-                ON DELETE CASCADE""",
-
-            # unike begrensninger
-            f"""ALTER TABLE {TABLE_RACK_SLOT}
-                ADD CONSTRAINT uq_rack_pos
-                UNIQUE (rack_id, position)""",
-            f"""ALTER TABLE {TABLE_RACK_SLOT}
-                ADD CONSTRAINT uq_sample_once
-                UNIQUE (sample_id)""",
-        ]
-
-        for stmt in fk_statements:
+        """
+        Kjør migrasjoner som ikke er brukt ennå.
+        Når skjemaet er oppdatert koster dette én spørring (SELECT MAX(version)).
+        """
+        with self._cursor() as cursor:
+            if self._schema_version(cursor) >= MIGRATIONS[-1][0]:
+                return
+            # Flere prosesser kan starte samtidig – bare én migrerer
+            cursor.execute("SELECT GET_LOCK(%s, %s) AS got", (MIGRATION_LOCK, MIGRATION_LOCK_TIMEOUT_S))
+            if not cast(Dict[str, Any], cursor.fetchone())["got"]:
+                raise RuntimeError("Fikk ikke migreringslåsen i databasen")
             try:
-                self.cursor.execute(stmt)
-            except mysql.connector.errors.DatabaseError as err:
-                # Error code 1826: Duplicate foreign key constraint name
-                # Error code 1061: Duplicate key name (for unique constraints)
-                if err.errno == 1826 or err.errno == 1061:
-                    print(f"Constraint in statement already exists, skipping: {stmt[:50]}...") # Log or pass
-                else:
-                    raise # Re-raise other database errors
-        self.conn.commit()
-
-    # ---------- Hjelpe-metoder ----------
-    def _fetchdict(self, query: str, params: tuple = ()) -> Optional[Dict[str, Any]]:
-        self.cursor.execute(query, params)
-        res = self.cursor.fetchone()
-        return cast(Optional[Dict[str, Any]], res)
+                cursor.execute(
+                    f"""CREATE TABLE IF NOT EXISTS {TABLE_SCHEMA_VERSION} (
+                        version    INT PRIMARY KEY,
+                        name       VARCHAR(100) NOT NULL,
+                        applied_at DATETIME DEFAULT CURRENT_TIMESTAMP)"""
+                )
+                current = self._schema_version(cursor)
+                for version, name, statements in MIGRATIONS:
+                    if version <= current:
+                        continue
+                    for stmt in statements:
+                        self._apply(cursor, stmt)
+                    cursor.execute(
+                        f"INSERT INTO {TABLE_SCHEMA_VERSION} (version, name) VALUES (%s, %s)",
+                        (version, name),
+                    )
+                    print(f"Schema migration {version} applied: {name}")
+            finally:
+                cursor.execute("SELECT RELEASE_LOCK(%s)", (MIGRATION_LOCK,))
+                cursor.fetchall()
+
+    def _schema_version(self, cursor: MySQLCursorDict) -> int:
+        try:
+            cursor.execute(f"SELECT MAX(version) AS version FROM {TABLE_SCHEMA_VERSION}")
+        except mysql.connector.errors.ProgrammingError as err:
+            if err.errno == 1146:   # Tabellen finnes ikke – helt ny eller eldre database
+                return 0
+            raise
+        row = cast(Dict[str, Any], cursor.fetchone())
+        return int(row["version"] or 0)
+
+    def _apply(self, cursor: MySQLCursorDict, stmt: str) -> None:
+        """Én migreringssetning; objekter som allerede finnes (databaser fra før migrasjonene) hoppes over."""
+        try:
+            cursor.execute(stmt)
+        except mysql.connector.errors.DatabaseError as err:
+            if err.errno in ALREADY_EXISTS_ERRNOS:
+                print(f"Already exists, skipping: {stmt.strip()[:50]}...")
+            else:
+                raise
 
     # ---------- API-metoder ----------
     # 1) Finn sample_type til en gitt matrix-kode
     def get_sample_type_by_matrix(self, matrix: str) -> int:
-        _matrix = matrix.strip()
-        row = self._fetchdict(
-            f"SELECT sample_type FROM {TABLE_SAMPLE} WHERE matrix = %s LIMIT 1",
-            (_matrix,),
-        )
-        type = int(row["sample_type"]) if row else -1
+        sample = self._sample_info(matrix)
+        type = int(sample["sample_type"]) if sample else -1
         return type
 
-    # 2) Legg et beger i første ledige posisjon i en skinne
-    def place_sample_in_rack(
-            self,
-            rack_rfid: str,
-            matrix: str,
-    ) -> int:
-
-        # 1) Finn rack_id
-        rack = self._fetchdict(
-            f"SELECT id FROM {TABLE_RACK} WHERE rfid = %s",
-            (rack_rfid,),
-        )
-        if not rack:
-            raise ValueError(f"Ukjent rack-RFID: {rack_rfid}")
-        rack_id: int = rack["id"]
-
-        # 2) Finn sample_id fra matrise­kode
-        sample = self._fetchdict(
-            f"SELECT id FROM {TABLE_SAMPLE} WHERE matrix = %s LIMIT 1",
-            (matrix,),
-        )
-        if not sample:
-            raise ValueError(f"Fant ingen prøve med matrisekode {matrix!r}")
-        sample_id: int = sample["id"]
-
-        # 3) Finn hvilke posisjoner som allerede er opptatt
-        self.cursor.execute(
-            f"SELECT position FROM {TABLE_RACK_SLOT} WHERE rack_id = %s",
-            (rack_id,),
-        )
-        occupied = {int(r["position"]) for r in self.cursor.fetchall()} # type: ignore
-
-        # 4) Første ledige posisjon – her forutsetter vi maks 10
-        for pos in range(1, 11):
-            if pos not in occupied:
-                break
-        else:
-            raise ValueError(f"Rack {rack_rfid} er fullt")
-
-        # 5) Sett inn posten
-        self.cursor.execute(
-            f"""INSERT INTO {TABLE_RACK_SLOT} (rack_id, position, sample_id)
-                VALUES (%s, %s, %s)""",
-            (rack_id, pos, sample_id),
-        )
-        self.conn.commit()
-        return pos
-    
+    def _sample_info(self, matrix: str) -> Optional[Dict[str, Any]]:
+        """sample_type og sample_taken_time for en matrisekode (via cache)."""
+        _matrix = matrix.strip()
+
+        def load() -> Optional[Dict[str, Any]]:
+            rows = self._query("sample_by_matrix", (_matrix,))
+            return rows[0] if rows else None
+
+        return self.sample_type_cache.get_or_load(_matrix, load)
+
+    # 2) Legg et helt brett med begre i posisjoner DataStore har reservert, i én transaksjon
+    def insert_samples_at(self, rows: Sequence[Tuple[int, int, str]]) -> List[Optional[str]]:
+        """
+        Setter inn [(rack_id, posisjon, matrix), ...] med én flerrads-INSERT og én commit.
+        Prøver som mangler eller allerede er plassert hoppes over; returnerer feilmelding eller None per rad.
+        PositionTakenError hvis en av posisjonene er tatt i databasen (da settes ingenting inn).
+        """
+        if not rows:
+            return []
+        matrices = sorted({matrix for _, _, matrix in rows})
+
+        with self._transaction() as cursor:
+            # Prøvene låses, så en samtidig plassering av samme prøve venter på oss
+            cursor.execute(
+                f"""SELECT s.id, s.matrix, s.sample_type, s.sample_taken_time, rs.id IS NOT NULL AS placed
+                    FROM {TABLE_SAMPLE} s
+                    LEFT JOIN {TABLE_RACK_SLOT} rs ON rs.sample_id = s.id
+                    WHERE s.matrix IN ({_placeholders(matrices)})
+                    ORDER BY s.id
+                    FOR UPDATE OF s""",
+                tuple(matrices),
+            )
+            samples: Dict[str, Dict[str, Any]] = {}
+            for row in cursor.fetchall(): # type: ignore
+                samples.setdefault(row["matrix"], row) # type: ignore
+
+            errors: List[Optional[str]] = []
+            values = []
+            placed = set()
+            for rack_id, position, matrix in rows:
+                sample = samples.get(matrix)
+                if sample is None:
+                    errors.append(f"Fant ingen prøve med matrisekode {matrix!r}")
+                elif sample["placed"] or sample["id"] in placed:
+                    errors.append(f"Prøve med matrisekode {matrix!r} er allerede plassert")
+                else:
+                    placed.add(sample["id"])
+                    values.append((rack_id, position, sample["id"]))
+                    errors.append(None)
+
+            if values:
+                try:
+                    cursor.executemany(
+                        f"""INSERT INTO {TABLE_RACK_SLOT} (rack_id, position, sample_id)
+                            VALUES (%s, %s, %s)""",
+                        values,
+                    )
+                except mysql.connector.errors.IntegrityError as err:
+                    if err.errno == ER_DUP_ENTRY and "uq_rack_pos" in str(err.msg):
+                        raise PositionTakenError(f"En posisjon i brettet er opptatt: {err.msg}")
+                    raise
+
+        placed_at = datetime.now()
+        for (_, _, matrix), error in zip(rows, errors):
+            if error is None:
+                sample = samples[matrix]
+                self.throughput.record(int(sample["sample_type"]), sample["sample_taken_time"], placed_at)
+        return errors
+
+    # 2e) Bulk-innsetting av prøver (se sample_ingest.py)
+    def get_sample_type_ids(self) -> List[int]:
+        with self._cursor() as cursor:
+            cursor.execute(f"SELECT id FROM {TABLE_SAMPLE_TYPE}")
+            return [int(row["id"]) for row in cursor.fetchall()] # type: ignore
+
+    def insert_samples(self, rows: Sequence[Sequence[Any]]) -> int:
+        """
+        Sett inn (supplier, sample_taken_time, matrix, sample_type, batch_id, storage_temp, comment)
+        i én transaksjon. Matrisekoder som allerede finnes hoppes over. Returnerer antall innsatte.
+        """
+        if not rows:
+            return 0
+        matrices = [row[2] for row in rows]
+        with self._transaction() as cursor:
+            cursor.execute(
+                f"SELECT matrix FROM {TABLE_SAMPLE} WHERE matrix IN ({_placeholders(matrices)})",
+                tuple(matrices),
+            )
+            existing = {row["matrix"] for row in cursor.fetchall()} # type: ignore
+            new_rows = [tuple(row) for row in rows if row[2] not in existing]
+            if new_rows:
+                cursor.executemany(
+                    f"""INSERT INTO {TABLE_SAMPLE}
+                        (supplier, sample_taken_time, matrix, sample_type, batch_id, storage_temp, comment)
+                        VALUES (%s, %s, %s, %s, %s, %s, %s)""",
+                    new_rows,
+                )
+        return len(new_rows)
+
+    # 2c) Plasser i en posisjon som allerede er valgt (DataStore holder opptatte posisjoner i minnet)
+    def insert_sample_at(self, rack_id: int, position: int, matrix: str) -> None:
+        with self.pool.connection() as conn:
+            try:
+                cursor = self._execute(conn, "insert_sample_at", (rack_id, position, matrix))
+            except mysql.connector.errors.IntegrityError as err:
+                if err.errno == ER_DUP_ENTRY and "uq_rack_pos" in str(err.msg):
+                    raise PositionTakenError(f"Posisjon {position} i rack {rack_id} er opptatt")
+                if err.errno == ER_DUP_ENTRY and "uq_sample_once" in str(err.msg):
+                    raise ValueError(f"Prøve med matrisekode {matrix!r} er allerede plassert")
+                raise
+            if cursor.rowcount == 0:
+                raise ValueError(f"Fant ingen prøve med matrisekode {matrix!r}")
+        self._record_placement(matrix)
+
+    # 2d) Opptatte posisjoner for alle racks (eller ett), for minnekopien i DataStore
+    def get_rack_occupancy(self, rack_rfid: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Rader med rfid, rack_id og position (None for tomme racks)."""
+        if rack_rfid is not None:
+            return self._query("rack_occupancy", (rack_rfid,))
+        with self._cursor() as cursor:
+            cursor.execute(
+                f"""SELECT r.rfid, r.id AS rack_id, rs.position
+                    FROM {TABLE_RACK} r
+                    LEFT JOIN {TABLE_RACK_SLOT} rs ON rs.rack_id = r.id"""
+            )
+            return cast(List[Dict[str, Any]], cursor.fetchall())
+
 
 
     # 3) Hent alt innhold i en skinne via RFID
     def get_rack_contents(self, rack_rfid: str) -> List[Dict[str, Any]]:
-        self.cursor.execute(
-            f"""
-            SELECT
-                rs.position,
-                s.id   AS sample_id,
-                s.matrix,
-                st.name AS sample_test_type,
-                s.sample_taken_time
-            FROM {TABLE_RACK}   r
-            LEFT JOIN {TABLE_RACK_SLOT} rs ON r.id = rs.rack_id
-            LEFT JOIN {TABLE_SAMPLE}     s ON rs.sample_id = s.id
-            LEFT JOIN {TABLE_SAMPLE_TYPE} st ON s.sample_type = st.id
-            WHERE r.rfid = %s
-            ORDER BY rs.position
-            """,
-            (rack_rfid,),
-        )
-        return cast(List[Dict[str, Any]], self.cursor.fetchall())
+        return self._query("rack_contents", (rack_rfid,))
     
     def get_rfid_by_sample_type(self, sample_type: int) -> Optional[str]:
         """Henter RFID for en gitt sample_type."""
-        self.cursor.execute(
-            f"SELECT rfid FROM {TABLE_RACK} WHERE sample_type = %s LIMIT 1",
-            (sample_type,),
-        )
-        row = self.cursor.fetchone()
-        return cast(Dict[str, Any], row)["rfid"] if row else None
+        def load() -> Optional[str]:
+            rows = self._query("rfid_by_sample_type", (sample_type,))
+            return rows[0]["rfid"] if rows else None
+
+        return self.rack_rfid_cache.get_or_load(sample_type, load)
     
+    # ---------- Gjennomstrømning (dashbord) ----------
+    def _record_placement(self, matrix: str) -> None:
+        sample = self._sample_info(matrix)
+        if sample:
+            self.throughput.record(int(sample["sample_type"]), sample["sample_taken_time"], datetime.now())
+
+    def flush_throughput(self) -> None:
+        """Skriv ventende deltaer til placement_stats_hourly (én flerrads-upsert)."""
+        rows = self.throughput.drain()
+        if not rows:
+            return
+        try:
+            with self._cursor() as cursor:
+                cursor.executemany(
+                    f"""INSERT INTO {TABLE_PLACEMENT_STATS}
+                        (hour, sample_type, placements, wait_s_total, wait_s_max)
+                        VALUES (%s, %s, %s, %s, %s)
+                        ON DUPLICATE KEY UPDATE
+                            placements   = placements + VALUES(placements),
+                            wait_s_total = wait_s_total + VALUES(wait_s_total),
+                            wait_s_max   = GREATEST(wait_s_max, VALUES(wait_s_max))""",
+                    rows,
+                )
+        except Exception:
+            self.throughput.restore(rows)
+            raise
+
+    def get_throughput_stats(self, hours: int = 24) -> List[Dict[str, Any]]:
+        """
+        Plasseringer per time og sample_type de siste `hours` timene, med snitt/maks ventetid
+        fra sample_taken_time. Leser bare summeringstabellen (+ ikke-skrevne deltaer i minnet).
+        """
+        hours = max(1, min(int(hours), STATS_MAX_HOURS))
+        since = datetime.now().replace(minute=0, second=0, microsecond=0) - timedelta(hours=hours - 1)
+        with self._cursor() as cursor:
+            cursor.execute(
+                f"""SELECT hour, sample_type, placements, wait_s_total, wait_s_max
+                    FROM {TABLE_PLACEMENT_STATS} WHERE hour >= %s""",
+                (since,),
+            )
+            stored = [
+                (row["hour"], int(row["sample_type"]), int(row["placements"]),
+                 float(row["wait_s_total"]), float(row["wait_s_max"]))
+                for row in cursor.fetchall() # type: ignore
+            ]
+        pending = [row for row in self.throughput.pending() if row[0] >= since]
+        return merge_rows(stored + pending)
+
+    # 4) Tøm skinnene – innholdet arkiveres i rack_slot_history først
     def clear_sorting_data(self) -> None:
+        """
+        Flytter alt i rack_slot til rack_slot_history og tømmer rack_slot med TRUNCATE.
+        Tabellene låses så ingen plassering kommer mellom arkivering og TRUNCATE.
+        Partisjonene vedlikeholdes av bakgrunnstråden; mangler månedens partisjon, havner radene
+        i p_future og flyttes når den deles opp.
+        """
         try:
-            self.cursor.execute(f"DELETE FROM {TABLE_RACK_SLOT}")
-            self.conn.commit()
+            with self._cursor() as cursor:
+                cursor.execute(
+                    f"""LOCK TABLES {TABLE_RACK_SLOT} WRITE, {TABLE_RACK_SLOT} AS rs READ,
+                        {TABLE_RACK} AS r READ, {TABLE_SAMPLE} AS s READ,
+                        {TABLE_RACK_SLOT_HISTORY} WRITE"""
+                )
+                try:
+                    cursor.execute(
+                        f"""INSERT INTO {TABLE_RACK_SLOT_HISTORY}
+                            (rack_id, rack_rfid, position, sample_id, matrix, placed_at, cleared_at)
+                            SELECT rs.rack_id, r.rfid, rs.position, rs.sample_id, s.matrix,
+                                   COALESCE(rs.placed_at, NOW()), NOW()
+                            FROM {TABLE_RACK_SLOT} rs
+                            LEFT JOIN {TABLE_RACK} r ON r.id = rs.rack_id
+                            LEFT JOIN {TABLE_SAMPLE} s ON s.id = rs.sample_id"""
+                    )
+                    cursor.execute(f"TRUNCATE TABLE {TABLE_RACK_SLOT}")
+                finally:
+                    cursor.execute("UNLOCK TABLES")
         except mysql.connector.errors.ProgrammingError as err:
             if err.errno == 1146:
                 pass
             else:
                 raise
 
-    def create_debug_data(self) -> None:
-        # --- slett eksisterende data ---
-        for tbl in (TABLE_RACK_SLOT, TABLE_SAMPLE, TABLE_RACK, TABLE_SAMPLE_TYPE):
-            self.cursor.execute(f"DELETE FROM {tbl}")
-        self.conn.commit()
-
-        # --- opprett sample_type ---
-        sample_types = [
-            (SAMPLE_TYPE_YELLOW, "Gul"),
-            (SAMPLE_TYPE_GREEN,  "Grønn"),
-            (SAMPLE_TYPE_GG,     "GG"),
-        ]
-        self.cursor.executemany(
-            f"INSERT INTO {TABLE_SAMPLE_TYPE} (id, name) VALUES (%s, %s)",
-            sample_types,
-        )
-
-        # --- leverandør → sample_type-mapping ---
-        SUPPLIER_TYPE = {
-            "Leverandør A": SAMPLE_TYPE_YELLOW,
-            "Leverandør B": SAMPLE_TYPE_GREEN,
-            "Leverandør C": SAMPLE_TYPE_GG,
-        }
-
-        # --- opprett samples ---
-        samples = []
-        sample_id = 1
-        for matrix_list, supplier in zip(DEBUG_MATRIX_CODES, DEBUG_LEVRANDOR_CODES):
-            sample_type = SUPPLIER_TYPE[supplier]
-
-            # splitte «1001, 1002, …» til enkeltkoder
-            for code in (c.strip() for c in matrix_list.split(',')):
-                samples.append(
-                    (sample_id, supplier, "2023-10-01 12:00:00", code, sample_type)
-                )
-                sample_id += 1
-
-        self.cursor.executemany(
-            f"""INSERT INTO {TABLE_SAMPLE}
-                (id, supplier, sample_taken_time, matrix, sample_type)
-                VALUES (%s, %s, %s, %s, %s)""",
-            samples,
-        )
+    def _maintain_history_partitions(self) -> None:
+        """
+        Sørg for partisjon for inneværende og neste måned; dropp måneder eldre enn retention.
+        Kjøres av bakgrunnstråden. Har en annen instans gjort samme endring samtidig, hoppes den over.
+        """
+        try:
+            with self._cursor() as cursor:
+                self._ensure_history_partitions(cursor)
+        except mysql.connector.errors.DatabaseError as err:
+            if err.errno not in PARTITION_RACE_ERRNOS:
+                raise
+            print(f"Historikkpartisjonene ble endret samtidig av en annen instans: {err.msg}")
 
-        # --- opprett racks (én per type) ---
-        racks = [
-            (DEBUG_RFID_CODES[0], SAMPLE_TYPE_YELLOW),
-            (DEBUG_RFID_CODES[1], SAMPLE_TYPE_GREEN),
-            (DEBUG_RFID_CODES[2], SAMPLE_TYPE_GG),
-        ]
-        self.cursor.executemany(
-            f"INSERT INTO {TABLE_RACK} (rfid, sample_type) VALUES (%s, %s)",
-            racks,
+    def _ensure_history_partitions(self, cursor: MySQLCursorDict) -> None:
+        cursor.execute(
+            """SELECT PARTITION_NAME AS name FROM information_schema.PARTITIONS
+               WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s""",
+            (TABLE_RACK_SLOT_HISTORY,),
         )
+        existing = {row["name"] for row in cursor.fetchall()} # type: ignore
+
+        today = date.today()
+        months = [_add_months(today.replace(day=1), n) for n in (0, 1)]
+        missing = [m for m in months if _partition_name(m) not in existing]
+        if missing:
+            parts = ", ".join(
+                f"PARTITION {_partition_name(m)} VALUES LESS THAN ('{_add_months(m, 1).isoformat()}')"
+                for m in missing
+            )
+            cursor.execute(
+                f"""ALTER TABLE {TABLE_RACK_SLOT_HISTORY} REORGANIZE PARTITION p_future INTO
+                    ({parts}, PARTITION p_future VALUES LESS THAN (MAXVALUE))"""
+            )
+
+        if HISTORY_RETENTION_MONTHS > 0:
+            oldest = _partition_name(_add_months(today.replace(day=1), -HISTORY_RETENTION_MONTHS))
+            expired = sorted(n for n in existing if n.startswith("p2") and n < oldest)
+            if expired:
+                cursor.execute(f"ALTER TABLE {TABLE_RACK_SLOT_HISTORY} DROP PARTITION {', '.join(expired)}")
+
+    # 5) Historikk, nyeste først, sidevis med nøkkel (before_id) i stedet for OFFSET
+    def get_rack_slot_history(
+            self,
+            limit: int = 100,
+            before_id: Optional[int] = None,
+            matrix: Optional[str] = None,
+            rack_rfid: Optional[str] = None,
+            since: Optional[str] = None,
+            until: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Returnerer {"rows": [...], "next_before_id": id|None}. Send next_before_id inn igjen for neste side.
+        since/until (placed_at, 'YYYY-MM-DD[ HH:MM:SS]') begrenser søket til de aktuelle partisjonene.
+        """
+        limit = max(1, min(int(limit), HISTORY_MAX_PAGE_SIZE))
+        where, params = [], []
+        for clause, value in (
+            ("id < %s", before_id),
+            ("matrix = %s", matrix),
+            ("rack_rfid = %s", rack_rfid),
+            ("placed_at >= %s", since),
+            ("placed_at < %s", until),
+        ):
+            if value is not None:
+                where.append(clause)
+                params.append(value)
+        query = f"""SELECT id, rack_id, rack_rfid, position, sample_id, matrix, placed_at, cleared_at
+                    FROM {TABLE_RACK_SLOT_HISTORY}
+                    {"WHERE " + " AND ".join(where) if where else ""}
+                    ORDER BY id DESC
+                    LIMIT %s"""
+        with self._cursor() as cursor:
+            cursor.execute(query, tuple(params) + (limit + 1,))
+            rows = cast(List[Dict[str, Any]], cursor.fetchall())
+        next_before_id = rows[limit - 1]["id"] if len(rows) > limit else None
+        return {"rows": rows[:limit], "next_before_id": next_before_id}
 
-        self.conn.commit()
\ No newline at end of file
+    def create_debug_data(self) -> None:
+        self._write_debug_data()
+        self.invalidate_caches()
+
+    def _write_debug_data(self) -> None:
+        with self._transaction() as cursor:
+            # --- slett eksisterende data ---
+            for tbl in (TABLE_RACK_SLOT, TABLE_SAMPLE, TABLE_RACK, TABLE_SAMPLE_TYPE):
+                cursor.execute(f"DELETE FROM {tbl}")
+
+            # --- opprett sample_type ---
+            sample_types = [
+                (SAMPLE_TYPE_YELLOW, "Gul"),
+                (SAMPLE_TYPE_GREEN,  "Grønn"),
+                (SAMPLE_TYPE_GG,     "GG"),
+            ]
+            cursor.executemany(
+                f"INSERT INTO {TABLE_SAMPLE_TYPE} (id, name) VALUES (%s, %s)",
+                sample_types,
+            )
+
+            # --- leverandør → sample_type-mapping ---
+            SUPPLIER_TYPE = {
+                "Leverandør A": SAMPLE_TYPE_YELLOW,
+                "Leverandør B": SAMPLE_TYPE_GREEN,
+                "Leverandør C": SAMPLE_TYPE_GG,
+            }
+
+            # --- opprett samples ---
+            samples = []
+            sample_id = 1
+            for matrix_list, supplier in zip(DEBUG_MATRIX_CODES, DEBUG_LEVRANDOR_CODES):
+                sample_type = SUPPLIER_TYPE[supplier]
+
+                # splitte «1001, 1002, …» til enkeltkoder
+                for code in (c.strip() for c in matrix_list.split(',')):
+                    samples.append(
+                        (sample_id, supplier, "2023-10-01 12:00:00", code, sample_type)
+                    )
+                    sample_id += 1
+
+            cursor.executemany(
+                f"""INSERT INTO {TABLE_SAMPLE}
+                    (id, supplier, sample_taken_time, matrix, sample_type)
+                    VALUES (%s, %s, %s, %s, %s)""",
+                samples,
+            )
+
+            # --- opprett racks (én per type) ---
+            racks = [
+                (DEBUG_RFID_CODES[0], SAMPLE_TYPE_YELLOW),
+                (DEBUG_RFID_CODES[1], SAMPLE_TYPE_GREEN),
+                (DEBUG_RFID_CODES[2], SAMPLE_TYPE_GG),
+            ]
+            cursor.executemany(
+                f"INSERT INTO {TABLE_RACK} (rfid, sample_type) VALUES (%s, %s)",
+                racks,
+            )
@@ -12,10 +12,10 @@ s7_com.py
     print(f"Read value: {value}")
 """
 
-import os, json, time, re, snap7
+import os, json, time, re, ctypes, struct, snap7
 import mysql.connector as mysql
-from snap7.util import get_real, set_real
 import snap7.util
+from snap7.error import check_error
 
 PLC_IP   = os.getenv("PLC_IP",   "192.168.3.55")
 RACK = 0
@@ -23,45 +23,213 @@ SLOT = 1
 
 PAT  = re.compile(r"DB(\d+),(REAL|INT|DINT|BOOL|STRING)(\d+).(\d+)$")
 SIZE = {"REAL":4, "DINT":4, "INT":2, "BOOL":1, "STRING":66}
+
+# Grenser for ReadMultiVars/WriteMultiVars (S7-protokollen / Snap7)
+MAX_VARS = 20            # Maks antall variabler per forespørsel i Snap7
+READ_REQ_HEADER = 12     # S7-header (10) + funksjon og antall (2)
+READ_RES_HEADER = 14     # S7-header (12) + funksjon og antall (2)
+ITEM_REQ_SIZE = 12       # Adressespesifikasjon per variabel
+ITEM_DATA_HEADER = 4     # Returkode, transportstørrelse og lengde per dataelement
+
+
+def _struct_codec(fmt, conv):
+    """Lager (decode, encode) bundet til en forhåndskompilert struct for talltyper."""
+    st = struct.Struct(fmt)
+    unpack_from, pack = st.unpack_from, st.pack
+    def decode(data):
+        return unpack_from(data)[0]
+    def encode(payload):
+        return bytearray(pack(conv(payload)))
+    return decode, encode
+
+
+def _decode_bool(data):
+    return data[0] & 1
+
+
+def _encode_bool(payload):
+    return bytearray((1 if payload else 0,))
+
+
+def _decode_string(data):
+    return data[2:2+data[1]].decode("ascii")
+
+
+def _encode_string(payload):
+    buf = bytearray(SIZE["STRING"])
+    s = str(payload).encode("ascii")[:64]
+    buf[0], buf[1] = 64, len(s)
+    buf[2:2+len(s)] = s
+    return buf
+
+
+CODECS = {
+    "REAL":   _struct_codec(">f", float),
+    "INT":    _struct_codec(">h", int),
+    "DINT":   _struct_codec(">i", int),
+    "BOOL":   (_decode_bool, _encode_bool),
+    "STRING": (_decode_string, _encode_string),
+}
+
+
+class Tag:
+    """
+    Forhåndskompilert node-ID. Opprettes én gang via Tag.get() og caches per node-ID,
+    slik at regex-parsing og typeoppslag ikke skjer i skannesløyfen.
+    decode/encode er bundet til datatypen (struct-basert for REAL/INT/DINT).
+    """
+    __slots__ = ("node_id", "db", "typ", "offset", "bit", "size", "decode", "encode")
+
+    _cache: dict = {}
+
+    def __init__(self, node_id):
+        m = PAT.fullmatch(node_id)
+        if not m:
+            raise ValueError(f"Invalid node_id: {node_id}")
+        self.node_id = node_id
+        self.db = int(m.group(1))
+        self.typ = m.group(2)
+        self.offset = int(m.group(3))
+        self.bit = int(m.group(4))
+        self.size = SIZE[self.typ]
+        self.decode, self.encode = CODECS[self.typ]
+
+    @classmethod
+    def get(cls, node):
+        """Returnerer cachet Tag for en node-ID (eller Tag-en selv hvis den allerede er kompilert)."""
+        if isinstance(node, Tag):
+            return node
+        tag = cls._cache.get(node)
+        if tag is None:
+            tag = cls._cache[node] = cls(node)
+        return tag
+
+    def __repr__(self):
+        return f"Tag({self.node_id!r})"
+
+
+def _padded(size, last):
+    """Dataelementer med odde lengde fylles ut til partall, unntatt det siste."""
+    return size + (size & 1 and not last)
+
+
+class TagGroup:
+    """
+    Et registrert sett med node-IDer ("DB400,INT0.0"-syntaks) eller Tag-er som leses og
+    skrives samlet med ReadMultiVars/WriteMultiVars. Variablene pakkes i så få PDU-er som
+    mulig innenfor forhandlet PDU-størrelse og MAX_VARS. Resultater nøkles på det som ble
+    registrert (node-ID eller Tag).
+    Eksempel:
+        group = plc.tag_group(["DB500,BOOL0.0", "DB400,INT0.0"])
+        values = group.read()            # {"DB500,BOOL0.0": 1, "DB400,INT0.0": 0}
+        group.write({"DB400,INT0.0": 2101})
+    """
+    def __init__(self, plc, node_ids):
+        self.plc = plc
+        self.node_ids = list(dict.fromkeys(node_ids))
+        self.tags = {node: Tag.get(node) for node in self.node_ids}
+        # Lesebolker bygges ferdig én gang: (nøkler, S7DataItem-array, buffere)
+        self.read_plan = [self._build_items(chunk, None)
+                          for chunk in self._plan(self.node_ids, write=False)]
+
+    def _plan(self, nodes, write):
+        """Deler node-IDene i bolker som hver passer i én forespørsel og ett svar."""
+        pdu = self.plc.pdu_length
+        chunks, current = [], []
+        for node in nodes:
+            candidate = current + [node]
+            if current and (len(candidate) > MAX_VARS or
+                            self._chunk_size(candidate, write) > pdu):
+                chunks.append(current)
+                candidate = [node]
+            if self._chunk_size(candidate, write) > pdu:
+                raise ValueError(f"Node {node} passer ikke i en PDU på {pdu} bytes")
+            current = candidate
+        if current:
+            chunks.append(current)
+        return chunks
+
+    def _chunk_size(self, nodes, write):
+        """Største av forespørsel og svar (bytes) for en bolk med node-IDer."""
+        sizes = [self.tags[n].size for n in nodes]
+        data = sum(ITEM_DATA_HEADER + _padded(sz, i == len(sizes) - 1)
+                   for i, sz in enumerate(sizes))
+        request = READ_REQ_HEADER + ITEM_REQ_SIZE * len(nodes)
+        if write:
+            return max(request + data, READ_RES_HEADER + len(nodes))
+        return max(request, READ_RES_HEADER + data)
+
+    @staticmethod
+    def _item(tag, buffer):
+        item = snap7.type.S7DataItem()
+        item.Area = snap7.type.Areas.DB
+        item.DBNumber = tag.db
+        item.Result = 0
+        if tag.typ == "BOOL":
+            item.WordLen = snap7.type.WordLen.Bit
+            item.Start = tag.offset * 8 + tag.bit
+            item.Amount = 1
+        else:
+            item.WordLen = snap7.type.WordLen.Byte
+            item.Start = tag.offset
+            item.Amount = tag.size
+        item.pData = ctypes.cast(buffer, ctypes.POINTER(ctypes.c_uint8))
+        return item
+
+    def _build_items(self, chunk, values):
+        """Lager S7DataItem-array og buffere for en bolk (med skriveverdier hvis gitt)."""
+        tags = [self.tags[n] for n in chunk]
+        if values is None:
+            buffers = [ctypes.create_string_buffer(t.size) for t in tags]
+        else:
+            buffers = [ctypes.create_string_buffer(bytes(t.encode(values[n])), t.size)
+                       for n, t in zip(chunk, tags)]
+        items = (snap7.type.S7DataItem * len(chunk))(
+            *(self._item(t, b) for t, b in zip(tags, buffers)))
+        return chunk, items, buffers
+
+    def read(self):
+        """Leser alle node-IDene i gruppen. Returnerer {node_id: verdi}."""
+        values = {}
+        tags = self.tags
+        for chunk, items, buffers in self.read_plan:
+            self.plc.read_multi_vars(items)
+            for node, item, buffer in zip(chunk, items, buffers):
+                check_error(item.Result, context="client")
+                values[node] = tags[node].decode(buffer.raw)
+        return values
+
+    def write(self, values):
+        """Skriver {node_id: verdi} for node-IDer i gruppen med så få PDU-er som mulig."""
+        unknown = [n for n in values if n not in self.tags]
+        if unknown:
+            raise ValueError(f"Node(r) ikke registrert i gruppen: {unknown}")
+        nodes = [n for n in self.node_ids if n in values]
+        for chunk in self._plan(nodes, write=True):
+            _, items, _buffers = self._build_items(chunk, values)
+            self.plc.write_multi_vars(list(items))
+
+
 class PLC(snap7.client.Client):
     def __init__(self, plc_ip=PLC_IP, rack=RACK, slot=SLOT):
         super().__init__()
         #self.connect(plc_ip, rack, slot)
         self.connect(plc_ip, rack, slot)
+        self.pdu_length = self.get_pdu_length()
 
 
 
     def parse_node_id(self, s):
-        m = PAT.fullmatch(s)
-        if not m:
-            raise ValueError(f"Invalid node_id: {s}")
-
-        return int(m.group(1)), m.group(2), int(m.group(3)), int(m.group(4))
+        tag = Tag.get(s)
+        return tag.db, tag.typ, tag.offset, tag.bit
 
 
-    def _read_or_write(self, client, db, typ, ofs, payload, rw):
-        size = SIZE[typ]
+    def _read_or_write(self, tag, payload, rw):
         if rw == "read":
-            data = self.read_area(snap7.type.Areas.DB, db, ofs, size)
-            match typ:
-                case "REAL":  return get_real(data, 0)
-                case "INT":   return int.from_bytes(data, "big", signed=True)
-                case "DINT":  return int.from_bytes(data, "big", signed=True)
-                case "BOOL":  return data[0] & 1
-                case "STRING":
-                    return data[2:2+data[1]].decode("ascii")
+            data = self.read_area(snap7.type.Areas.DB, tag.db, tag.offset, tag.size)
+            return tag.decode(data)
         else:  # write
-            buf = bytearray(size)
-            match typ:
-                case "REAL":  set_real(buf, 0, float(payload))
-                case "INT":   buf[:] = int(payload).to_bytes(2, "big", signed=True)
-                case "DINT":  buf[:] = int(payload).to_bytes(4, "big", signed=True)
-                case "BOOL":  buf[0] = 1 if payload else 0
-                case "STRING":
-                    s = str(payload).encode("ascii")[:64]
-                    buf[0], buf[1] = 64, len(s)
-                    buf[2:2+len(s)] = s
-            self.write_area(snap7.type.Areas.DB, db, ofs, buf)
+            self.write_area(snap7.type.Areas.DB, tag.db, tag.offset, tag.encode(payload))
 
     def _write_bool_bit(self, client, db, byte_idx, bit_idx, value: bool):
         data = self.read_area(snap7.type.Areas.DB, db, byte_idx, 1)
@@ -72,16 +240,31 @@ class PLC(snap7.client.Client):
         data = self.read_area(snap7.type.Areas.DB, db, byte_idx, 1)
         return snap7.util.get_bool(data, 0, bit_idx)
 
+    def read_mask(self, db, byte_idx, count):
+        """
+        Leser `count` sammenhengende bits fra og med byte_idx.0 med én read_area og returnerer
+        dem som ett heltall (bit i ligger i byte byte_idx + i // 8, bit i % 8).
+        Samme format som skinnemaskene i DataStore.
+        """
+        data = self.read_area(snap7.type.Areas.DB, db, byte_idx, (count + 7) // 8)
+        return int.from_bytes(data, "little") & ((1 << count) - 1)
+
+    def tag_group(self, node_ids):
+        """Registrerer et sett node-IDer som leses/skrives samlet (se TagGroup)."""
+        return TagGroup(self, node_ids)
+
     def read_node(self, node):
-        db, typ, ofs, bit = self.parse_node_id(node)
-        if typ == "BOOL":
-            return self._read_bool_bit(snap7.type.Areas.DB, db, ofs, bit)
+        """Leser én node. `node` kan være en node-ID-streng eller en Tag."""
+        tag = Tag.get(node)
+        if tag.typ == "BOOL":
+            return self._read_bool_bit(snap7.type.Areas.DB, tag.db, tag.offset, tag.bit)
         else:
-            return self._read_or_write(snap7.type.Areas.DB, db, typ, ofs, None, "read")
+            return self._read_or_write(tag, None, "read")
         
     def write_node(self, node, payload):
-        db, typ, ofs, bit = self.parse_node_id(node)
-        if typ == "BOOL":
-            self._write_bool_bit(snap7.type.Areas.DB, db, ofs, bit, payload)
+        """Skriver én node. `node` kan være en node-ID-streng eller en Tag."""
+        tag = Tag.get(node)
+        if tag.typ == "BOOL":
+            self._write_bool_bit(snap7.type.Areas.DB, tag.db, tag.offset, tag.bit, payload)
         else:
-            self._read_or_write(snap7.type.Areas.DB, db, typ, ofs, payload, "write")
\ No newline at end of file
+            self._read_or_write(tag, payload, "write")
\ No newline at end of file
@@ -0,0 +1,215 @@
+"""
+sample_ingest.py
+• Bulk-innlesing av prøver fra leverandørfiler (CSV, JSON Lines eller JSON-liste) til sample-tabellen.
+• Filen strømmes radvis gjennom generatorer – hele filen lastes aldri inn i minnet.
+• Rader valideres, og settes inn i biter med executemany og én commit per bit.
+• Duplikater (matrisekode som finnes i databasen eller tidligere i filen) hoppes over.
+• Kun filer under INGEST_DIR kan leses (RPC-en er uten autentisering); stier utenfor avvises.
+• Eksempel på bruk (via DataStore / XML-RPC), med filen lagt i INGEST_DIR:
+    stats = proxy.ingest_sample_file("leveranse.csv")
+Kolonner/felter: supplier, sample_taken_time, matrix, sample_type, [batch_id, storage_temp, comment]
+"""
+
+import csv
+import json
+import os
+import time
+from datetime import datetime
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+INGEST_DIR = os.getenv("INGEST_DIR", "/data/ingest")               # Eneste mappe filer leses fra
+INGEST_CHUNK_SIZE = int(os.getenv("INGEST_CHUNK_SIZE", "1000"))   # Rader per executemany/commit
+INGEST_MAX_ERRORS = 20                                            # Antall valideringsfeil som rapporteres
+READ_BLOCK_SIZE = 64 * 1024
+
+REQUIRED_FIELDS = ("supplier", "sample_taken_time", "matrix", "sample_type")
+
+# Rekkefølgen verdiene settes inn i (matcher DBSample.insert_samples)
+SampleRow = Tuple[str, datetime, str, int, Optional[str], Optional[float], Optional[str]]
+
+
+# --------------------------------------------------
+# Sti
+# --------------------------------------------------
+def resolve_ingest_path(path: str, base: str = INGEST_DIR) -> str:
+    """
+    Full sti til en fil under `base` (relative stier regnes fra `base`, symlenker følges).
+    ValueError hvis stien havner utenfor `base`.
+    """
+    root = os.path.realpath(base)
+    full = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, full]) != root or full == root:
+        raise ValueError(f"Filen må ligge i {base}")
+    return full
+
+
+# --------------------------------------------------
+# Lesing (generatorer)
+# --------------------------------------------------
+def _iter_csv(path: str) -> Iterator[Dict[str, Any]]:
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        sample = f.read(4096)
+        f.seek(0)
+        try:
+            dialect: Any = csv.Sniffer().sniff(sample, delimiters=",;\t")
+        except csv.Error:
+            dialect = csv.excel
+        yield from csv.DictReader(f, dialect=dialect)
+
+
+def _iter_json_lines(path: str) -> Iterator[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _iter_json_array(path: str) -> Iterator[Dict[str, Any]]:
+    """Strømmer elementene i en JSON-liste ([{...}, {...}]) med raw_decode, blokk for blokk."""
+    decoder = json.JSONDecoder()
+    with open(path, encoding="utf-8") as f:
+        buf = ""
+        started = False
+        eof = False
+        while True:
+            buf = buf.lstrip()
+            if not started and buf:
+                if buf[0] != "[":
+                    raise ValueError("JSON-filen må være en liste av objekter")
+                buf = buf[1:]
+                started = True
+                continue
+            if started and buf[:1] == ",":
+                buf = buf[1:]
+                continue
+            if started and buf[:1] == "]":
+                return
+            if buf:
+                try:
+                    obj, end = decoder.raw_decode(buf)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                else:
+                    yield obj
+                    buf = buf[end:]
+                    continue
+            if eof:
+                if started:
+                    raise ValueError("JSON-listen mangler avsluttende ']'")
+                return
+            block = f.read(READ_BLOCK_SIZE)
+            eof = not block
+            buf += block
+
+
+def iter_records(path: str) -> Iterator[Dict[str, Any]]:
+    """Velg leser etter filendelse: .csv, .jsonl/.ndjson eller .json."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        return _iter_csv(path)
+    if ext in (".jsonl", ".ndjson"):
+        return _iter_json_lines(path)
+    if ext == ".json":
+        return _iter_json_array(path)
+    raise ValueError(f"Ukjent filtype {ext!r} (støtter .csv, .json, .jsonl)")
+
+
+# --------------------------------------------------
+# Validering
+# --------------------------------------------------
+def _optional(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def validate_record(record: Dict[str, Any], sample_types: Iterable[int]) -> SampleRow:
+    """Gjør en rå rad om til verdier for INSERT, eller ValueError med årsak."""
+    missing = [k for k in REQUIRED_FIELDS if not _optional(record.get(k))]
+    if missing:
+        raise ValueError(f"mangler {', '.join(missing)}")
+
+    matrix = str(record["matrix"]).strip()
+    if len(matrix) > 255:
+        raise ValueError(f"matrix for lang ({len(matrix)} tegn)")
+    try:
+        taken = datetime.fromisoformat(str(record["sample_taken_time"]).strip())
+    except ValueError:
+        raise ValueError(f"ugyldig sample_taken_time {record['sample_taken_time']!r}")
+    try:
+        sample_type = int(record["sample_type"])
+    except (TypeError, ValueError):
+        raise ValueError(f"ugyldig sample_type {record['sample_type']!r}")
+    if sample_type not in sample_types:
+        raise ValueError(f"ukjent sample_type {sample_type}")
+
+    temp = _optional(record.get("storage_temp"))
+    try:
+        storage_temp = float(temp.replace(",", ".")) if temp else None
+    except ValueError:
+        raise ValueError(f"ugyldig storage_temp {temp!r}")
+
+    return (
+        str(record["supplier"]).strip(),
+        taken,
+        matrix,
+        sample_type,
+        _optional(record.get("batch_id")),
+        storage_temp,
+        _optional(record.get("comment")),
+    )
+
+
+def _chunks(rows: Iterator[SampleRow], size: int) -> Iterator[List[SampleRow]]:
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+# --------------------------------------------------
+# Innlesing
+# --------------------------------------------------
+def ingest_file(db: Any, path: str, chunk_size: int = INGEST_CHUNK_SIZE) -> Dict[str, Any]:
+    """
+    Les `path` inn i sample-tabellen via db (DBSample).
+    Returnerer telling av leste/innsatte/duplikate/ugyldige rader, tid og rader per sekund.
+    """
+    stats: Dict[str, Any] = {"read": 0, "inserted": 0, "duplicates": 0, "invalid": 0, "errors": []}
+    sample_types = set(db.get_sample_type_ids())
+    seen: set = set()   # Matrisekoder fra tidligere i filen
+    start = time.monotonic()
+
+    def valid_rows() -> Iterator[SampleRow]:
+        for line_no, record in enumerate(iter_records(path), start=1):
+            stats["read"] += 1
+            try:
+                row = validate_record(record, sample_types)
+            except (ValueError, AttributeError) as e:
+                stats["invalid"] += 1
+                if len(stats["errors"]) < INGEST_MAX_ERRORS:
+                    stats["errors"].append(f"rad {line_no}: {e}")
+                continue
+            if row[2] in seen:
+                stats["duplicates"] += 1
+                continue
+            seen.add(row[2])
+            yield row
+
+    for chunk in _chunks(valid_rows(), chunk_size):
+        inserted = db.insert_samples(chunk)
+        stats["inserted"] += inserted
+        stats["duplicates"] += len(chunk) - inserted
+
+    elapsed = time.monotonic() - start
+    stats["seconds"] = round(elapsed, 3)
+    stats["rows_per_s"] = round(stats["read"] / elapsed, 1) if elapsed > 0 else 0.0
+    print(f"[INGEST] {path}: {stats['inserted']} satt inn, {stats['duplicates']} duplikater, "
+          f"{stats['invalid']} ugyldige av {stats['read']} rader på {stats['seconds']} s "
+          f"({stats['rows_per_s']} rader/s)")
+    return stats
+
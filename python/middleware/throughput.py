@@ -0,0 +1,73 @@
+"""
+throughput.py
+• Løpende timesaggregater for plasseringer: antall per time og sample_type, og ventetid
+  fra sample_taken_time til plassering (sum og maks).
+• Oppdateres i minnet ved hver plassering; en bakgrunnstråd i DBSample skriver deltaene til
+  placement_stats_hourly hvert STATS_FLUSH_S sekund og ved avslutning, så dashbordet leser en liten ferdig tabell i stedet for å skanne historikk.
+• Deltaer som ikke er skrevet ennå tas med i lesing via pending().
+"""
+
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+# (time, sample_type, antall, sum ventetid [s], maks ventetid [s])
+StatsRow = Tuple[datetime, int, int, float, float]
+
+
+def hour_of(ts: datetime) -> datetime:
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+
+class ThroughputRollup:
+    """Trådsikker akkumulator av plasseringsdeltaer per (time, sample_type)."""
+
+    def __init__(self) -> None:
+        self._pending: Dict[Tuple[datetime, int], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, sample_type: int, taken: Optional[datetime], placed_at: datetime) -> None:
+        wait_s = max((placed_at - taken).total_seconds(), 0.0) if taken else 0.0
+        with self._lock:
+            acc = self._pending.setdefault((hour_of(placed_at), sample_type), [0, 0.0, 0.0])
+            acc[0] += 1
+            acc[1] += wait_s
+            acc[2] = max(acc[2], wait_s)
+
+    def drain(self) -> List[StatsRow]:
+        """Ta ut alle deltaer for skriving; legg dem tilbake med restore() hvis skrivingen feiler."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        return [(hour, st, int(acc[0]), acc[1], acc[2]) for (hour, st), acc in pending.items()]
+
+    def restore(self, rows: List[StatsRow]) -> None:
+        with self._lock:
+            for hour, st, count, wait_total, wait_max in rows:
+                acc = self._pending.setdefault((hour, st), [0, 0.0, 0.0])
+                acc[0] += count
+                acc[1] += wait_total
+                acc[2] = max(acc[2], wait_max)
+
+    def pending(self) -> List[StatsRow]:
+        with self._lock:
+            return [(hour, st, int(acc[0]), acc[1], acc[2]) for (hour, st), acc in self._pending.items()]
+
+
+def merge_rows(rows: List[StatsRow]) -> List[Dict[str, object]]:
+    """Slå sammen lagrede og ventende rader til dashbord-format, sortert på time og sample_type."""
+    merged: Dict[Tuple[datetime, int], List[float]] = {}
+    for hour, st, count, wait_total, wait_max in rows:
+        acc = merged.setdefault((hour, st), [0, 0.0, 0.0])
+        acc[0] += count
+        acc[1] += wait_total
+        acc[2] = max(acc[2], wait_max)
+    return [
+        {
+            "hour": hour,
+            "sample_type": st,
+            "placements": int(acc[0]),
+            "avg_wait_s": round(acc[1] / acc[0], 1) if acc[0] else 0.0,
+            "max_wait_s": round(acc[2], 1),
+        }
+        for (hour, st), acc in sorted(merged.items())
+    ]
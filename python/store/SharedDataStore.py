@@ -7,14 +7,22 @@ Hovedfunksjoner:
 - Håndtering av sorteringsdata for UR-roboten.
 - Håndtering av UR-logg.
 - Håndtering av forespørsler til databasen for QR-data og skinneinnhold.
+- Minnekopi av rack-belegg (RackIndex) så plassering og skinneinnhold slipper DB-oppslag.
 - Debug-funksjonalitet for testing av matriser og RFID-koder.
 - Trådsikre metoder for tilgang til delt data.
 """
 
 
+import os
 import threading
-from typing import List, Dict, Any, Optional, cast
-from middleware.db_com import DBSample
+import time
+from functools import partialmethod
+from typing import List, Dict, Any, Optional, Tuple, cast
+from middleware.db_com import DBSample, PositionTakenError, DB_PLACE_RETRIES
+from middleware.sample_ingest import ingest_file, resolve_ingest_path
+from store.rack_index import RackIndex
+from config import rails as rail_config
+from config.rails import RAIL_LENGTH, RAIL_FULL_MASK
 
 DEBUG_MATRIX_CODES = [
     "1001", "1002", "1003", "1004", "1005", "1006", "1007", "1008", "1009", "1010",
@@ -38,6 +46,46 @@ REQ_DB_UPDATE_QR_DATA = 2202 # Oppdater QR-data i databasen
 REQ_UR_START_SORTING = 2301 # Start sortering i UR-roboten
 REQ_UR_STOP_SORTING = 2302 # Stopp sortering i UR-roboten
 
+DB_CLEAR_ON_START = os.getenv("DB_CLEAR_ON_START", "1") != "0"   # Arkiver og tøm rack_slot ved oppstart (0 = behold plasseringer)
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "64")) # Maks antall ventende jobber i PLC-køen
+MAX_WAIT_FOR_CHANGE = 30.0 # Maks blokkeringstid (sekunder) for wait_for_change
+
+# Skinner: kortnavn (brukt i RPC) -> felt i Data, avledet fra config/rails.py.
+# Skinnene lagres som bitmasker (bit i = posisjon i), samme format som bitsene i PLC-en.
+RAILS = {rail.name: rail.field for rail in rail_config.RAILS}
+RAIL_FIELDS = frozenset(RAILS.values())
+
+# Navn på de offentlige feltene i Data (kan overvåkes med wait_for_change)
+FIELDS = (
+    "PLC_STATUS", "PLC_JOB",
+    "UR_STATUS", "UR_JOB", "UR_log",
+    "DB_STATUS", "DB_JOB", "DB_DATA_FROM_TABLE",
+    *RAILS.values(),
+)
+
+# Felt som PLC-tråden må reagere på (jobber og skinner som synkroniseres til PLC)
+PLC_FIELDS = frozenset(("PLC_JOB", *(rail.field for rail in rail_config.RAILS if rail.sync)))
+
+
+def mask_to_list(mask: int, length: int = RAIL_LENGTH) -> List[int]:
+    """Bitmaske -> liste med 0/1 (kompatibilitet med det listebaserte API-et)."""
+    return [(mask >> i) & 1 for i in range(length)]
+
+
+def list_to_mask(values) -> int:
+    """Liste med verdier -> bitmaske (alle verdier ulik 0 regnes som opptatt)."""
+    mask = 0
+    for i, value in enumerate(values):
+        if value:
+            mask |= 1 << i
+    return mask
+
+
+def first_free_index(mask: int, length: int = RAIL_LENGTH) -> int:
+    """Laveste ledige posisjon i en skinne (O(1) bit-triks), -1 hvis skinnen er full."""
+    free = ~mask & ((1 << length) - 1)
+    return (free & -free).bit_length() - 1
+
 
 if __name__ == "__main__":
     IDLE = 0000
@@ -58,31 +106,83 @@ if __name__ == "__main__":
 
 class Data:
     """
-    En enkel databeholder for delt tilstandsinformasjon.
-    Denne klassen inneholder selve dataene. DataStore vil håndtere trådsikker tilgang.
+    En uforanderlig (immutable) databeholder for delt tilstandsinformasjon.
+    Hver endring lager en ny Data via evolve() (copy-on-write), og DataStore bytter
+    referansen atomisk. Lesere tar bare en referanse til gjeldende Data og ser derfor
+    alltid en konsistent tilstand uten å låse.
+    Lister lagres som tupler, skinnene (UR_SORTING_*) som heltall-bitmasker.
+    PLC_JOB er en kø: tuppel av (jobb, tidspunkt_innlagt). UR_JOB er siste verdi (som PLC_STATUS).
     """
-    def __init__(self):
-        self.PLC_STATUS = IDLE
-        self.PLC_JOB = 0
-
-        self.UR_STATUS = IDLE
-        self.UR_JOB = 0
-        self.UR_log = []
-
-        self.DB_STATUS = IDLE
-        self.DB_JOB = 0
-        
-        self.DB_DATA_FROM_TABLE = []
-
-        self.DB_REQUEST_QR_DATA = {
-
-        }
-
-        self.UR_SORTING_RAMP =  [0] * 10
-        self.UR_SORTING_GUL =   [0] * 10
-        self.UR_SORTING_GRONN = [0] * 10
-        self.UR_SORTING_BEGGE = [0] * 10
-        
+    __slots__ = (
+        "PLC_STATUS", "PLC_JOB",
+        "UR_STATUS", "UR_JOB", "UR_log",
+        "DB_STATUS", "DB_JOB", "DB_DATA_FROM_TABLE", "DB_REQUEST_QR_DATA",
+        *RAILS.values(),
+        "version", "field_versions",
+    )
+
+    def __init__(self, version: int = 0):
+        init = object.__setattr__
+        init(self, "PLC_STATUS", IDLE)
+        init(self, "PLC_JOB", ())
+
+        init(self, "UR_STATUS", IDLE)
+        init(self, "UR_JOB", 0)
+        init(self, "UR_log", ())
+
+        init(self, "DB_STATUS", IDLE)
+        init(self, "DB_JOB", 0)
+
+        init(self, "DB_DATA_FROM_TABLE", ())
+
+        init(self, "DB_REQUEST_QR_DATA", {})
+
+        # Skinner (UR_SORTING_RAMP, ...) fra config/rails.py, alle tomme
+        for field in RAILS.values():
+            init(self, field, 0)
+
+        # Global versjon og siste versjon per felt (endres aldri etter opprettelse)
+        init(self, "version", version)
+        init(self, "field_versions", dict.fromkeys(FIELDS, version))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Data er uforanderlig; bruk evolve()")
+
+    def evolve(self, **changes) -> "Data":
+        """Returnerer en ny Data med endringene, versjon + 1 og oppdaterte feltversjoner."""
+        new = object.__new__(Data)
+        init = object.__setattr__
+        for name in Data.__slots__:
+            init(new, name, changes[name] if name in changes else getattr(self, name))
+        version = self.version + 1
+        field_versions = dict(self.field_versions)
+        for name in changes:
+            field_versions[name] = version
+        init(new, "version", version)
+        init(new, "field_versions", field_versions)
+        return new
+
+
+def _field_value(data: Data, key: str) -> Any:
+    """Offentlig verdi for et felt: PLC-køen vises som eldste jobb, skinner og tupler som lister."""
+    value = getattr(data, key)
+    if key in RAIL_FIELDS:
+        return mask_to_list(value)
+    if key == "PLC_JOB":
+        return value[0][0] if value else 0
+    return list(value) if isinstance(value, tuple) else value
+
+
+def _queue_info(queue: tuple, capacity: int, counters: Dict[str, int]) -> Dict[str, Any]:
+    """Kø-dybde, kapasitet, tellere og alder (sekunder) for hver ventende jobb."""
+    now = time.monotonic()
+    return {
+        "depth": len(queue),
+        "capacity": capacity,
+        "enqueued": counters["enqueued"],
+        "rejected": counters["rejected"],
+        "jobs": [{"job": job, "age": now - t} for job, t in queue],
+    }
 
 
 class DataStore:
@@ -90,15 +190,28 @@ class DataStore:
     def __init__(self):
         self._data = Data()
 
-        self._lock = threading.Lock()
-        self._lock_logs = threading.Lock()
-        self._lock_ur_sorting = threading.Lock()
-        self._lock_ur = threading.Lock()
-        self._lock_plc = threading.Lock()
-        self._lock_db = threading.Lock()
+        # Kun skrivere låser. Lesere leser self._data (én referanse) uten lås.
+        self._write_lock = threading.Lock()
+
+        # Tellere for PLC-jobbkøen, oppdateres under _write_lock
+        self.job_queue_size = JOB_QUEUE_SIZE
+        self._job_counters = {
+            "PLC_JOB": {"enqueued": 0, "rejected": 0},
+        }
+
+        # Signal til PLC-tråden om at noe den bryr seg om er endret (jobb eller skinner)
+        self._plc_wakeup = threading.Event()
+
+        # Vekker klienter i wait_for_change når en ny Data er publisert
+        self._change_cond = threading.Condition()
 
         self.db_handler = DBSample()
-        #self.db_handler.clear_sorting_data() # Tømmer sorteringsdata i databasen ved oppstart
+        if DB_CLEAR_ON_START:
+            self.db_handler.clear_sorting_data()
+
+        # Opptatte posisjoner per rack; lastes én gang fra rack_slot, oppdateres ved plassering/tømming
+        self._rack_index = RackIndex()
+        self._rack_index.load(self.db_handler.get_rack_occupancy())
         #self.db_handler.create_debug_data() # Opprett testdata i databasen for debugging
 
         self.debug_current_matrix = 0
@@ -106,179 +219,298 @@ class DataStore:
         self.debug_matrix_codes = DEBUG_MATRIX_CODES
         self.debug_rfid_codes = DEBUG_RFID_CODES
 
+    # --- PLC-vekking ---
+    # Metodene PLC-tråden bruker (_wait_for_plc_work, _take_plc_jobs, _get_rail_masks_since) har
+    # understrek: register_instance eksponerer ellers alle offentlige metoder over RPC.
+    def _notify_plc(self) -> None:
+        """Vekker PLC-tråden slik at endringen sendes uten å vente en hel skanneperiode."""
+        self._plc_wakeup.set()
+
+    def _wait_for_plc_work(self, timeout: float) -> bool:
+        """
+        Blokkerer til en PLC-relevant endring skjer eller timeout (sekunder) går ut.
+        Returnerer True hvis tråden ble vekket av en endring, False ved timeout.
+        PLC-tråden avgjør selv om den skal vente når det ligger jobber i køen (se plc_handler).
+        """
+        woken = self._plc_wakeup.wait(timeout)
+        self._plc_wakeup.clear()
+        return woken
+
+    # --- Copy-on-write og endringssporing ---
+    def _publish(self, **changes) -> Data:
+        """
+        Publiserer en ny Data med endringene. Må kalles med _write_lock holdt.
+        Øker versjon, vekker ventende klienter og ev. PLC-tråden.
+        """
+        new = self._data.evolve(**changes)
+        self._data = new  # Atomisk referansebytte
+        with self._change_cond:
+            self._change_cond.notify_all()
+        if PLC_FIELDS.intersection(changes):
+            self._notify_plc()
+        return new
+
+    def _update(self, **changes) -> bool:
+        """Tar skrivelåsen og publiserer endringene."""
+        with self._write_lock:
+            self._publish(**changes)
+        return True
+
+    def get_version(self) -> int:
+        """Nåværende globale endringsversjon."""
+        return self._data.version
+
+    def get_read_version(self, method: str, params: Tuple[Any, ...]) -> Optional[int]:
+        """
+        Versjonen av dataene bak et lesekall, for RPC-lagets svarcache (handlers/response_cache.py).
+        Feltmetodene bruker feltversjonen, get_rack_contents rackets generasjon i RackIndex.
+        None betyr at kallet ikke kan caches.
+        """
+        if method == "get_rack_contents":
+            if len(params) == 1 and isinstance(params[0], str):
+                return self._rack_index.contents_version(params[0])
+            return None
+        field = CACHEABLE_READS.get(method)
+        if field is None or params:
+            return None
+        return self._data.field_versions[field]
+
+    def get_snapshot(self) -> Dict[str, Any]:
+        """
+        Returnerer alle felt atomisk i ett kall: {"version": int, "values": {felt: verdi}}.
+        Verdiene er konsistente med hverandre og med versjonen.
+        """
+        data = self._data
+        return {
+            "version": data.version,
+            "values": {key: _field_value(data, key) for key in FIELDS},
+        }
+
+    def get_changes_since(self, version: int) -> Dict[str, Any]:
+        """
+        Returnerer kun felt endret etter `version`: {"version": int, "values": {felt: verdi}}.
+        Klienten sender returnert versjon i neste kall; tom "values" betyr ingen endring.
+        """
+        data = self._data
+        return {
+            "version": data.version,
+            "values": {key: _field_value(data, key) for key in FIELDS
+                       if data.field_versions[key] > version},
+        }
+
+    def wait_for_change(self, keys: Optional[List[str]] = None, since_version: int = 0,
+                        timeout: float = MAX_WAIT_FOR_CHANGE) -> Dict[str, Any]:
+        """
+        Long-poll: blokkerer til ett av feltene i `keys` (alle hvis tom) er endret etter
+        `since_version`, eller timeout (sekunder, maks MAX_WAIT_FOR_CHANGE) går ut.
+        Returnerer {"version": int, "changed": [felt], "values": {felt: verdi}}.
+        Klienten sender returnert versjon som since_version i neste kall.
+        """
+        keys = list(keys) if keys else list(FIELDS)
+        unknown = [k for k in keys if k not in FIELDS]
+        if unknown:
+            raise ValueError(f"Ukjente felt: {unknown}")
+        deadline = time.monotonic() + max(0.0, min(float(timeout), MAX_WAIT_FOR_CHANGE))
+        with self._change_cond:
+            while True:
+                data = self._data
+                changed = [k for k in keys if data.field_versions[k] > since_version]
+                remaining = deadline - time.monotonic()
+                if changed or remaining <= 0:
+                    break
+                self._change_cond.wait(remaining)
+        return {
+            "version": data.version,
+            "changed": changed,
+            "values": {k: _field_value(data, k) for k in keys},
+        }
+
+    # --- Jobbkøer ---
+    def _enqueue(self, key: str, job) -> bool:
+        """Legger en jobb i køen `key`. Returnerer False (og teller avvisning) hvis køen er full."""
+        with self._write_lock:
+            queue = getattr(self._data, key)
+            counters = self._job_counters[key]
+            if len(queue) >= self.job_queue_size:
+                counters["rejected"] += 1
+                return False
+            counters["enqueued"] += 1
+            self._publish(**{key: queue + ((job, time.monotonic()),)})
+        return True
+
+    def _dequeue(self, key: str, max_items: Optional[int]) -> List[Tuple[int, float]]:
+        """Fjerner opptil max_items (alle hvis None) jobber. Returnerer [(jobb, alder_s), ...]."""
+        with self._write_lock:
+            queue = getattr(self._data, key)
+            count = len(queue) if max_items is None else min(max_items, len(queue))
+            if count:
+                self._publish(**{key: queue[count:]})
+        now = time.monotonic()
+        return [(job, now - t) for job, t in queue[:count]]
+
     # --- PLC Metoder ---
     def get_plc_status(self):
-        with self._lock_plc:
-            return self._data.PLC_STATUS
+        return self._data.PLC_STATUS
         
     def get_free_ramp_index(self) -> int:
-        with self._lock_db:
-            for i, value in enumerate(self._data.UR_SORTING_RAMP):
-                if value == 0:
-                    return i
-            return -1  # Ingen ledig indeks funnet
+        return self.get_free_rail_index("ramp")  # -1: Ingen ledig indeks funnet
 
     def set_plc_status(self, status) -> bool:
-        with self._lock_plc:
-            self._data.PLC_STATUS = status
+        with self._write_lock:
+            if self._data.PLC_STATUS != status:
+                self._publish(PLC_STATUS=status)
         return True
 
     def get_plc_job(self):
-        with self._lock_plc:
-            return self._data.PLC_JOB
+        """Eldste ventende PLC-jobb (0 hvis ingen). Fjerner den ikke."""
+        return _field_value(self._data, "PLC_JOB")
 
     def set_plc_job(self, job) -> bool:
-        with self._lock_plc:
-            self._data.PLC_JOB = job
-        return True
+        """Legger en PLC-jobb i køen. Returnerer False hvis køen er full. Jobb 0 tømmer køen."""
+        if not job:
+            return self.clear_plc_job()
+        return self._enqueue("PLC_JOB", job)
+
+    def _take_plc_jobs(self, max_items: Optional[int] = None) -> List[Tuple[int, float]]:
+        """Henter og fjerner opptil max_items PLC-jobber. Returnerer [(jobb, alder_s), ...]."""
+        return self._dequeue("PLC_JOB", max_items)
+
+    def get_plc_job_queue(self) -> Dict[str, Any]:
+        """Kø-dybde og alder for ventende PLC-jobber."""
+        return _queue_info(self._data.PLC_JOB, self.job_queue_size, self._job_counters["PLC_JOB"])
 
     # --- UR Metoder ---
     def get_ur_status(self):
-        with self._lock_ur:
-            return self._data.UR_STATUS
+        return self._data.UR_STATUS
 
     def set_ur_status(self, status) -> bool:
-        with self._lock_ur:
-            self._data.UR_STATUS = status
+        with self._write_lock:
+            if self._data.UR_STATUS != status:
+                self._publish(UR_STATUS=status)
         return True
 
     def get_ur_job(self) -> int:
-        with self._lock_ur:
-            return self._data.UR_JOB
+        """Siste UR-jobb (0 hvis ingen). UR-jobben er en tilstand (start/stopp sortering), ikke en kø."""
+        return self._data.UR_JOB
 
     def set_ur_job(self, job) -> bool:
-        with self._lock_ur:
-            self._data.UR_JOB = job
-        return True
+        """Setter UR-jobben; en ny verdi erstatter den forrige."""
+        return self._update(UR_JOB=job)
+
+    def take_ur_job(self) -> int:
+        """Henter og nullstiller UR-jobben atomisk (0 hvis ingen)."""
+        with self._write_lock:
+            job = self._data.UR_JOB
+            if job:
+                self._publish(UR_JOB=0)
+        return job
 
     # --- DB Metoder ---
     def get_db_status(self):
-        with self._lock_db:
-            return self._data.DB_STATUS
+        return self._data.DB_STATUS
 
     def set_db_status(self, status) -> bool:
-        with self._lock_db:
-            self._data.DB_STATUS = status
-        return True
+        return self._update(DB_STATUS=status)
 
     def get_db_job(self):
-        with self._lock_db:
-            return self._data.DB_JOB
+        return self._data.DB_JOB
 
     def set_db_job(self, job) -> bool:
-        with self._lock_db:
-            self._data.DB_JOB = job
-        return True
+        return self._update(DB_JOB=job)
 
     def get_db_data_from_table(self):
-        with self._lock_db:
-            return list(self._data.DB_DATA_FROM_TABLE)
+        return list(self._data.DB_DATA_FROM_TABLE)
 
     def set_db_data_from_table(self, data) -> bool:
-        with self._lock_db:
-            self._data.DB_DATA_FROM_TABLE = data
-        return True
+        return self._update(DB_DATA_FROM_TABLE=tuple(data))
 
-    def get_ur_sorting_ramp(self) -> list:
-        with self._lock_ur_sorting:
-            return list(self._data.UR_SORTING_RAMP) 
-    
-    def get_ur_sorting_gul(self) -> list:
-        with self._lock_ur_sorting:
-            return list(self._data.UR_SORTING_GUL)
-    
-    def get_ur_sorting_gronn(self) -> list:
-        with self._lock_ur_sorting:
-            return list(self._data.UR_SORTING_GRONN)
-    
-    def get_ur_sorting_begge(self) -> list:
-        with self._lock_ur_sorting:
-            return list(self._data.UR_SORTING_BEGGE)
-    
-    def clear_ur_sorting_ramp(self) -> bool:
-        with self._lock_ur_sorting:
-            self._data.UR_SORTING_RAMP = [0] * len(self._data.UR_SORTING_RAMP)
+    # --- Skinner (bitmasker; listemetodene under er kompatibilitetslag) ---
+    def _set_rail_item(self, key: str, index: int, value: int) -> bool:
+        if not 0 <= index < RAIL_LENGTH:
+            return False
+        bit = 1 << index
+        with self._write_lock:
+            mask = getattr(self._data, key)
+            self._publish(**{key: mask | bit if value else mask & ~bit})
         return True
 
-    def set_ur_sorting_ramp_item(self, index: int, value: int) -> bool:
-        if 0 <= index < len(self._data.UR_SORTING_RAMP):
-            self._data.UR_SORTING_RAMP[index] = value
-            return True
-        return False
-
-    def set_ur_sorting_ramp_full(self, new_list: list) -> bool:
-        if isinstance(new_list, list) and len(new_list) == len(self._data.UR_SORTING_RAMP):
-            self._data.UR_SORTING_RAMP = new_list
-            return True
-        return False
-        
-    def set_ur_sorting_gul_item(self, index: int, value: int) -> bool:
-        if 0 <= index < len(self._data.UR_SORTING_GUL):
-            self._data.UR_SORTING_GUL[index] = value
-            return True
-        return False
-    
-    def set_ur_sorting_gul_full(self, new_list: list) -> bool:
-        with self._lock_ur_sorting:
-            if isinstance(new_list, list) and len(new_list) == len(self._data.UR_SORTING_GUL):
-                self._data.UR_SORTING_GUL = new_list
-                return True
-            return False
-    
-    def set_ur_sorting_gronn_item(self, index: int, value: int) -> bool:
-        with self._lock_ur_sorting:
-            if 0 <= index < len(self._data.UR_SORTING_GRONN):
-                self._data.UR_SORTING_GRONN[index] = value
-                return True
+    def _set_rail_full(self, key: str, new_list: list) -> bool:
+        if not (isinstance(new_list, list) and len(new_list) == RAIL_LENGTH):
             return False
-    
-    def set_ur_sorting_gronn_full(self, new_list: list) -> bool:
-        with self._lock_ur_sorting:
-            if isinstance(new_list, list) and len(new_list) == len(self._data.UR_SORTING_GRONN):
-                self._data.UR_SORTING_GRONN = new_list
-                return True
-            return False
-    
-    def set_ur_sorting_begge_item(self, index: int, value: int) -> bool:
-        with self._lock_ur_sorting:
-            if 0 <= index < len(self._data.UR_SORTING_BEGGE):
-                self._data.UR_SORTING_BEGGE[index] = value
-                return True
-            return False
-    
-    def set_ur_sorting_begge_full(self, new_list: list) -> bool:
-        with self._lock_ur_sorting:
-            if isinstance(new_list, list) and len(new_list) == len(self._data.UR_SORTING_BEGGE):
-                self._data.UR_SORTING_BEGGE = new_list
-                return True
+        return self._update(**{key: list_to_mask(new_list)})
+
+    def _rail_field(self, rail: str) -> str:
+        try:
+            return RAILS[rail]
+        except KeyError:
+            raise ValueError(f"Ukjent skinne '{rail}', gyldige: {list(RAILS)}")
+
+    def get_ur_sorting_mask(self, rail: str) -> int:
+        """Skinnen som bitmaske (bit i = posisjon i er opptatt)."""
+        return getattr(self._data, self._rail_field(rail))
+
+    def get_ur_sorting_masks(self) -> Dict[str, int]:
+        """Alle skinner som bitmasker fra samme øyeblikksbilde."""
+        data = self._data
+        return {rail: getattr(data, key) for rail, key in RAILS.items()}
+
+    def set_ur_sorting_mask(self, rail: str, mask: int) -> bool:
+        """Setter hele skinnen fra en bitmaske. Bits utenfor skinnelengden avvises."""
+        key = self._rail_field(rail)
+        if not 0 <= mask <= RAIL_FULL_MASK:
             return False
-    
-        
+        return self._update(**{key: mask})
+
+    def _get_rail_masks_since(self, version: int) -> Tuple[int, Dict[str, int]]:
+        """Returnerer (versjon, {skinne: maske}) for skinner endret etter `version`."""
+        data = self._data
+        return data.version, {rail: getattr(data, key) for rail, key in RAILS.items()
+                              if data.field_versions[key] > version}
+
+    def get_free_rail_index(self, rail: str) -> int:
+        """Laveste ledige posisjon i skinnen, -1 hvis full."""
+        return first_free_index(self.get_ur_sorting_mask(rail))
+
+    def get_rail_config(self) -> Dict[str, Any]:
+        """Skinnegeometrien fra config/rails.py (lengde og skinner)."""
+        return {
+            "length": RAIL_LENGTH,
+            "rails": [rail._asdict() for rail in rail_config.RAILS],
+        }
+
+    def get_ur_sorting(self, rail: str) -> list:
+        """Skinnen som liste med 0/1 (generisk variant av get_ur_sorting_ramp osv.)."""
+        return mask_to_list(self.get_ur_sorting_mask(rail))
+
+    def set_ur_sorting_item(self, rail: str, index: int, value: int) -> bool:
+        return self._set_rail_item(self._rail_field(rail), index, value)
+
+    def set_ur_sorting_full(self, rail: str, new_list: list) -> bool:
+        return self._set_rail_full(self._rail_field(rail), new_list)
+
+    def clear_ur_sorting(self, rail: str) -> bool:
+        return self._update(**{self._rail_field(rail): 0})
+
+
     def clear_plc_job(self) -> bool:
-        with self._lock:
-            self._data.PLC_JOB = 0
-        return True
+        """Fjerner alle ventende PLC-jobber."""
+        return self._update(PLC_JOB=())
     
     def clear_ur_job(self) -> bool:
-        with self._lock:
-            self._data.UR_JOB = 0  # type: ignore
-        return True
+        return self._update(UR_JOB=0)
     
     def clear_db_job(self) -> bool:
-        with self._lock:
-            self._data.DB_JOB = 0
-        return True
+        return self._update(DB_JOB=0)
     
     def clear_all_jobs(self) -> bool:
-        with self._lock:
-            self._data.PLC_JOB = 0
-            self._data.UR_JOB = 0 # type: ignore
-            self._data.DB_JOB = 0
-        return True
+        return self._update(PLC_JOB=(), UR_JOB=0, DB_JOB=0)
     
     def clear_all_data(self) -> bool:
-        with self._lock:
-            self._data = Data()
+        with self._write_lock:
+            fresh = Data()
+            # Ny tom tilstand, men versjonen fortsetter å øke og alle felt markeres som endret
+            self._publish(**{name: getattr(fresh, name) for name in Data.__slots__
+                             if name not in ("version", "field_versions")})
         return True
     
     def get_sample_type(self, matrix: str) -> int:
@@ -291,13 +523,106 @@ class DataStore:
     def place_sample_in_rack(self, rack_rfid: str, sample_matrix: str) -> int:
         """Returnerer hvilken posisjon (1-N) begeret ble plassert i."""
         try:
-            position = self.db_handler.place_sample_in_rack(rack_rfid, sample_matrix)
-            return position
+            return self._place_in_free_slot(rack_rfid, sample_matrix)
         except ValueError as e:
             raise ValueError(f"Feil ved plassering av sample i skinne: {e}")
         except Exception as e:
             raise RuntimeError(f"Uventet feil ved plassering av sample: {e}")
-    
+
+    def _reload_rack(self, rack_rfid: str) -> None:
+        self._rack_index.load(self.db_handler.get_rack_occupancy(rack_rfid), rack_rfid)
+
+    def _place_in_free_slot(self, rack_rfid: str, sample_matrix: str) -> int:
+        """
+        Velg posisjon fra minnekopien og sett inn med én DB-setning.
+        Avviker databasen (endret utenfor DataStore), lastes racket på nytt og vi prøver igjen.
+        """
+        if rack_rfid not in self._rack_index:
+            self._reload_rack(rack_rfid)     # Rack opprettet etter oppstart
+            if rack_rfid not in self._rack_index:
+                raise ValueError(f"Ukjent rack-RFID: {rack_rfid}")
+
+        reloaded = False
+        for _ in range(DB_PLACE_RETRIES):
+            slot = self._rack_index.reserve(rack_rfid)
+            if slot is None:
+                if reloaded:
+                    raise ValueError(f"Rack {rack_rfid} er fullt")
+                self._reload_rack(rack_rfid)  # Kan være tømt utenfor DataStore – sjekk én gang
+                reloaded = True
+                continue
+            rack_id, position = slot
+            try:
+                self.db_handler.insert_sample_at(rack_id, position, sample_matrix)
+                # Ny generasjon: innhold lest mellom reservasjon og INSERT er utdatert
+                self._rack_index.mark(rack_rfid, position)
+                return position
+            except PositionTakenError:
+                self._reload_rack(rack_rfid)
+                reloaded = True
+            except Exception:
+                self._rack_index.release(rack_rfid, position)
+                raise
+        raise RuntimeError(f"Kunne ikke plassere {sample_matrix!r} i {rack_rfid} etter {DB_PLACE_RETRIES} forsøk")
+
+    def place_samples_in_racks(self, items: List[List[str]]) -> List[Dict[str, Any]]:
+        """
+        Batch-variant av place_sample_in_rack for et helt brett: [[rack_rfid, matrix], ...].
+        Posisjonene reserveres i RackIndex som ved enkeltplassering og settes inn i én transaksjon.
+        Kolliderer en posisjon i databasen, lastes racket på nytt og hele brettet prøves igjen.
+        Returnerer per element {"position": int|None, "error": str|None}.
+        """
+        items = [(str(rfid), str(matrix)) for rfid, matrix in items]
+        try:
+            for _ in range(DB_PLACE_RETRIES):
+                results, slots = self._reserve_slots(items)
+                try:
+                    errors = self.db_handler.insert_samples_at(
+                        [(rack_id, position, matrix) for _, rfid, rack_id, position, matrix in slots])
+                except PositionTakenError:
+                    for rfid in {slot[1] for slot in slots}:
+                        self._reload_rack(rfid)
+                    continue
+                except Exception:
+                    for _, rfid, _, position, _ in slots:
+                        self._rack_index.release(rfid, position)
+                    raise
+                for (i, rfid, _, position, _), error in zip(slots, errors):
+                    if error is None:
+                        self._rack_index.mark(rfid, position)
+                        results[i] = {"position": position, "error": None}
+                    else:
+                        self._rack_index.release(rfid, position)
+                        results[i] = {"position": None, "error": error}
+                return results
+        except ValueError as e:
+            raise ValueError(f"Feil ved plassering av samples i skinner: {e}")
+        except Exception as e:
+            raise RuntimeError(f"Uventet feil ved plassering av samples: {e}")
+        raise RuntimeError(f"Kunne ikke plassere brettet etter {DB_PLACE_RETRIES} forsøk")
+
+    def _reserve_slots(self, items: List[Tuple[str, str]]) -> Tuple[List[Dict[str, Any]], List[Tuple[int, str, int, int, str]]]:
+        """
+        Reserver én posisjon per element. Returnerer (resultater med feil for ukjente/fulle racks,
+        reservasjoner som (indeks, rfid, rack_id, posisjon, matrix)).
+        """
+        results: List[Dict[str, Any]] = [{"position": None, "error": None} for _ in items]
+        slots = []
+        reloaded = set()
+        for i, (rfid, matrix) in enumerate(items):
+            if rfid not in self._rack_index and rfid not in reloaded:
+                self._reload_rack(rfid)     # Rack opprettet etter oppstart
+                reloaded.add(rfid)
+            if rfid not in self._rack_index:
+                results[i]["error"] = f"Ukjent rack-RFID: {rfid}"
+                continue
+            slot = self._rack_index.reserve(rfid)
+            if slot is None:
+                results[i]["error"] = f"Rack {rfid} er fullt"
+                continue
+            slots.append((i, rfid, slot[0], slot[1], matrix))
+        return results, slots
+
     # Funksjon for å hente RFID som passern en type test (1 2 eller 3), 1 = Gul, 2 = Grønn, 3 = Begge
     def get_rfid_for_test_type(self, test_type: int) -> Optional[str]:
         """
@@ -315,8 +640,16 @@ class DataStore:
     
         
     def get_rack_contents(self, rack_rfid: str) -> List[Dict[str, Any]]:
+        """
+        Fra minnet hvis racket ikke er endret og innholdet er yngre enn RACK_CONTENTS_TTL_S,
+        ellers fra DB (og caches). TTL-en fanger opp plasseringer backend skriver direkte i rack_slot.
+        """
+        cached, generation = self._rack_index.contents(rack_rfid)
+        if cached is not None:
+            return [dict(row) for row in cached]
         try:
             contents = self.db_handler.get_rack_contents(rack_rfid)
+            self._rack_index.store_contents(rack_rfid, generation, [dict(row) for row in contents])
             return contents
         except ValueError as e:
             raise ValueError(f"Feil ved henting av skinneinnhold: {e}")
@@ -327,10 +660,48 @@ class DataStore:
         """Tømmer sorteringsdata i databasen."""
         try:
             self.db_handler.clear_sorting_data()
+            self._rack_index.clear()
             self.clear_all_data()  # Tømmer også DataStore for sorteringsdata
             return True
         except Exception as e:
             raise RuntimeError(f"Uventet feil ved tømming av sorteringsdata: {e}")
+
+    def get_rack_slot_history(self, limit: int = 100, before_id: Optional[int] = None,
+                              matrix: Optional[str] = None, rack_rfid: Optional[str] = None,
+                              since: Optional[str] = None, until: Optional[str] = None) -> Dict[str, Any]:
+        """Side med arkiverte plasseringer, nyeste først; send next_before_id inn for neste side."""
+        try:
+            return self.db_handler.get_rack_slot_history(limit, before_id, matrix, rack_rfid, since, until)
+        except Exception as e:
+            raise RuntimeError(f"Uventet feil ved henting av plasseringshistorikk: {e}")
+
+    def get_throughput_stats(self, hours: int = 24) -> List[Dict[str, Any]]:
+        """Plasseringer per time og sample_type med snitt/maks ventetid (for dashbordet)."""
+        try:
+            return self.db_handler.get_throughput_stats(hours)
+        except Exception as e:
+            raise RuntimeError(f"Uventet feil ved henting av gjennomstrømning: {e}")
+
+    def ingest_sample_file(self, path: str) -> Dict[str, Any]:
+        """
+        Les inn en leverandørfil (CSV/JSON/JSONL i INGEST_DIR på serveren) i sample-tabellen.
+        Returnerer leste/innsatte/duplikate/ugyldige rader, tid og rader per sekund.
+        """
+        try:
+            return ingest_file(self.db_handler, resolve_ingest_path(path))
+        except (OSError, ValueError) as e:
+            raise ValueError(f"Feil ved innlesing av {path}: {e}")
+        except Exception as e:
+            raise RuntimeError(f"Uventet feil ved innlesing av prøver: {e}")
+
+    def db_invalidate_cache(self) -> bool:
+        """Tømmer oppslagscachen i DBSample – kalles etter endringer i sample/rack utenfor Python."""
+        self.db_handler.invalidate_caches()
+        return True
+
+    def get_db_cache_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Treff/bom per oppslagscache, for å se at robotens hot path holder seg i minnet."""
+        return self.db_handler.get_cache_stats()
         
     def debug_scan_next_matrix(self) -> str:
         if self.debug_current_matrix < len(self.debug_matrix_codes):
@@ -341,28 +712,52 @@ class DataStore:
             raise IndexError("Ingen flere matriser å skanne i debug-modus.")
 
     def append_ur_log(self, message: str) -> bool:
-        with self._lock_logs:
-            if isinstance(message, str) and message:
-                self._data.UR_log.append(message)
-                return True
+        if not (isinstance(message, str) and message):
             return False
+        with self._write_lock:
+            self._publish(UR_log=self._data.UR_log + (message,))
+        return True
     
     def get_ur_log(self, index: int = -1) -> list:
-        with self._lock_logs:
-            if index == -1:
-                return list(self._data.UR_log)
-            elif 0 <= index < len(self._data.UR_log):
-                return self._data.UR_log[index]
-            else:
-                return []
+        log = self._data.UR_log
+        if index == -1:
+            return list(log)
+        elif 0 <= index < len(log):
+            return log[index]
+        else:
+            return []
     
     def clear_ur_logs(self) -> bool:
-        with self._lock_logs:
-            self._data.UR_log.clear()
-            return True    
+        return self._update(UR_log=())
     
     def clear_sorting_data(self) -> bool:
-        with self._lock_ur_sorting:
-            self.db_handler.clear_sorting_data()
+        self.db_handler.clear_sorting_data()
+        self._rack_index.clear()
         return True
-    
\ No newline at end of file
+
+
+# Navngitte listemetoder per konfigurert skinne (get_ur_sorting_ramp, set_ur_sorting_gul_item,
+# clear_ur_sorting_ramp osv.), generert fra config/rails.py så de alltid finnes for skinnene som er
+# konfigurert – og bare for dem. Kompatibilitetslag over de generiske metodene med skinnenavn.
+def _add_rail_methods(cls: type) -> None:
+    for rail in RAILS:
+        setattr(cls, f"get_ur_sorting_{rail}", partialmethod(cls.get_ur_sorting, rail))
+        setattr(cls, f"set_ur_sorting_{rail}_item", partialmethod(cls.set_ur_sorting_item, rail))
+        setattr(cls, f"set_ur_sorting_{rail}_full", partialmethod(cls.set_ur_sorting_full, rail))
+        setattr(cls, f"clear_ur_sorting_{rail}", partialmethod(cls.clear_ur_sorting, rail))
+
+
+_add_rail_methods(DataStore)
+
+# Lesemetoder uten parametre som RPC-laget kan cache ferdig kodet, og feltet svaret avhenger av
+# (get_rack_contents caches også, men versjoneres per rack – se get_read_version)
+CACHEABLE_READS = {
+    method: field
+    for method, field in {
+        "get_plc_status": "PLC_STATUS",
+        "get_ur_status": "UR_STATUS",
+        "get_db_status": "DB_STATUS",
+        **{f"get_ur_sorting_{name}": field for name, field in RAILS.items()},
+    }.items()
+    if callable(getattr(DataStore, method, None))
+}
@@ -0,0 +1,146 @@
+"""
+rack_index.py
+Minnekopi av rack_slot for DataStore.
+• Opptatte posisjoner per rack som bitmaske (bit 0 = posisjon 1), samme idé som skinnene.
+• Ledig posisjon reserveres under lås, så samtidige plasseringer i samme rack får ulike posisjoner
+  uten at databasen må spørres.
+• Cacher resultatet av get_rack_contents per rack til racket endres, men maks RACK_CONTENTS_TTL_S:
+  backend skriver rack_slot direkte, så innholdet valideres jevnlig mot databasen.
+• Generasjonene er unike på tvers av racks og omlastinger, og brukes også som versjon for
+  RPC-lagets svarcache (DataStore.get_read_version).
+MySQL er fortsatt den varige kilden; indeksen lastes derfra ved oppstart og ved avvik.
+"""
+
+import itertools
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from config.rails import RAIL_FULL_MASK
+
+RACK_CONTENTS_TTL_S = float(os.getenv("RACK_CONTENTS_TTL_S", "5"))   # Maks alder på cachet rackinnhold
+
+_generations = itertools.count(1)   # Felles teller, så en generasjon aldri gjenbrukes
+
+
+class _Rack:
+    __slots__ = ("rack_id", "mask", "contents", "stored_at", "generation")
+
+    def __init__(self, rack_id: int, mask: int = 0) -> None:
+        self.rack_id = rack_id
+        self.mask = mask
+        self.contents: Optional[List[Dict[str, Any]]] = None
+        self.stored_at = 0.0
+        self.generation = next(_generations)   # Ny ved hver endring, så utdaterte innholdslister ikke lagres
+
+    def changed(self) -> None:
+        self.contents = None
+        self.generation = next(_generations)
+
+    def fresh(self) -> bool:
+        return self.contents is not None and time.monotonic() - self.stored_at < RACK_CONTENTS_TTL_S
+
+
+class RackIndex:
+    """Opptatte posisjoner og cachet innhold per rack-RFID."""
+
+    def __init__(self) -> None:
+        self._racks: Dict[str, _Rack] = {}
+        self._lock = threading.Lock()
+
+    # ---------- Lasting ----------
+    def load(self, rows: Iterable[Dict[str, Any]], rfid: Optional[str] = None) -> None:
+        """
+        Bygg indeksen (eller ett rack når rfid er gitt) fra rader med rfid, rack_id og position
+        (position er None for tomme racks).
+        """
+        racks: Dict[str, _Rack] = {}
+        for row in rows:
+            rack = racks.setdefault(row["rfid"], _Rack(int(row["rack_id"])))
+            if row["position"] is not None:
+                rack.mask |= 1 << (int(row["position"]) - 1)
+        with self._lock:
+            if rfid is None:
+                self._racks = racks
+            elif rfid in racks:
+                self._racks[rfid] = racks[rfid]
+            else:
+                self._racks.pop(rfid, None)
+
+    def __contains__(self, rfid: str) -> bool:
+        return rfid in self._racks
+
+    # ---------- Posisjoner ----------
+    def reserve(self, rfid: str) -> Optional[Tuple[int, int]]:
+        """
+        Reserver første ledige posisjon. Returnerer (rack_id, posisjon), eller None hvis racket er fullt.
+        KeyError hvis racket ikke er kjent.
+        """
+        with self._lock:
+            rack = self._racks[rfid]
+            free = ~rack.mask & RAIL_FULL_MASK
+            if not free:
+                return None
+            bit = free & -free
+            rack.mask |= bit
+            rack.changed()
+            return rack.rack_id, bit.bit_length()
+
+    def release(self, rfid: str, position: int) -> None:
+        """Gi tilbake en reservert posisjon når innsettingen feilet."""
+        with self._lock:
+            rack = self._racks.get(rfid)
+            if rack is not None:
+                rack.mask &= ~(1 << (position - 1))
+                rack.changed()
+
+    def mark(self, rfid: str, position: int) -> None:
+        """Registrer en posisjon som er satt inn utenom reserve() (f.eks. batch-plassering)."""
+        with self._lock:
+            rack = self._racks.get(rfid)
+            if rack is not None:
+                rack.mask |= 1 << (position - 1)
+                rack.changed()
+
+    def clear(self) -> None:
+        """Alle racks tomme (etter at rack_slot er arkivert og tømt)."""
+        with self._lock:
+            for rack in self._racks.values():
+                rack.mask = 0
+                rack.changed()
+
+    # ---------- Innhold ----------
+    def contents_version(self, rfid: str) -> Optional[int]:
+        """Generasjonen til gyldig cachet innhold, None hvis innholdet mangler eller er for gammelt."""
+        with self._lock:
+            rack = self._racks.get(rfid)
+            return rack.generation if rack is not None and rack.fresh() else None
+
+    def contents(self, rfid: str) -> Tuple[Optional[List[Dict[str, Any]]], int]:
+        """
+        (cachet innhold, eller None hvis det mangler eller er eldre enn RACK_CONTENTS_TTL_S; generasjon).
+        Generasjonen gis tilbake til store_contents.
+        """
+        with self._lock:
+            rack = self._racks.get(rfid)
+            if rack is None:
+                return None, -1
+            return (rack.contents if rack.fresh() else None), rack.generation
+
+    def store_contents(self, rfid: str, generation: int, contents: List[Dict[str, Any]]) -> None:
+        """
+        Lagre innhold hentet fra DB, men bare hvis racket ikke er endret i mellomtiden.
+        Avviker det fra forrige innhold (skrevet utenfor DataStore), får racket ny generasjon, og
+        posisjonene legges inn i masken så de ikke reserveres.
+        """
+        with self._lock:
+            rack = self._racks.get(rfid)
+            if rack is None or rack.generation != generation:
+                return
+            if rack.contents is not None and rack.contents != contents:
+                rack.generation = next(_generations)
+            for row in contents:
+                if row.get("position") is not None:
+                    rack.mask |= 1 << (int(row["position"]) - 1)
+            rack.contents = contents
+            rack.stored_at = time.monotonic()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Modulene importeres som i main.py (from store..., from handlers...), med python-mappen på stien
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
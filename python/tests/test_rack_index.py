@@ -0,0 +1,96 @@
+import pytest
+
+from config.rails import RAIL_LENGTH
+from store import rack_index
+from store.rack_index import RackIndex
+
+RFID = "E2801160600002084C5A1D3B"
+
+
+def make_index(*positions, rfid=RFID, rack_id=3):
+    index = RackIndex()
+    rows = [{"rfid": rfid, "rack_id": rack_id, "position": p} for p in positions or (None,)]
+    index.load(rows)
+    return index
+
+
+def test_reserve_takes_lowest_free_position():
+    index = make_index(1, 3)
+    assert index.reserve(RFID) == (3, 2)
+    assert index.reserve(RFID) == (3, 4)
+
+
+def test_reserve_full_rack_and_unknown_rack():
+    index = make_index(*range(1, RAIL_LENGTH + 1))
+    assert index.reserve(RFID) is None
+    with pytest.raises(KeyError):
+        index.reserve("ukjent")
+
+
+def test_release_and_mark():
+    index = make_index()
+    _, position = index.reserve(RFID)
+    index.release(RFID, position)
+    assert index.reserve(RFID) == (3, position)
+
+    index.mark(RFID, position + 1)
+    assert index.reserve(RFID) == (3, position + 2)
+
+
+def test_load_single_rack_replaces_or_removes_it():
+    index = make_index(1)
+    index.load([{"rfid": RFID, "rack_id": 3, "position": 2}], RFID)
+    assert index.reserve(RFID) == (3, 1)
+    index.load([], RFID)
+    assert RFID not in index
+
+
+def test_contents_cached_until_rack_changes():
+    index = make_index()
+    cached, generation = index.contents(RFID)
+    assert cached is None and index.contents_version(RFID) is None
+
+    rows = [{"position": 1, "matrix": "MX1"}]
+    index.store_contents(RFID, generation, rows)
+    assert index.contents(RFID) == (rows, generation)
+    assert index.contents_version(RFID) == generation
+
+    index.reserve(RFID)
+    cached, new_generation = index.contents(RFID)
+    assert cached is None and new_generation != generation
+
+
+def test_contents_from_before_a_change_are_not_stored():
+    index = make_index()
+    _, generation = index.contents(RFID)
+    index.reserve(RFID)
+    index.store_contents(RFID, generation, [{"position": 1}])
+    assert index.contents(RFID)[0] is None
+
+
+def test_outside_change_bumps_generation_and_marks_positions():
+    index = make_index()
+    _, generation = index.contents(RFID)
+    index.store_contents(RFID, generation, [])
+    index.store_contents(RFID, generation, [{"position": 1, "matrix": "MX1"}])
+    assert index.contents_version(RFID) != generation
+    assert index.reserve(RFID) == (3, 2)
+
+
+def test_generations_unique_across_reload():
+    index = make_index()
+    seen = {index.contents(RFID)[1]}
+    index.load([{"rfid": RFID, "rack_id": 3, "position": None}])
+    seen.add(index.contents(RFID)[1])
+    index.clear()
+    seen.add(index.contents(RFID)[1])
+    assert len(seen) == 3
+
+
+def test_contents_expire_after_ttl(monkeypatch):
+    index = make_index()
+    _, generation = index.contents(RFID)
+    index.store_contents(RFID, generation, [])
+    monkeypatch.setattr(rack_index, "RACK_CONTENTS_TTL_S", 0.0)
+    assert index.contents(RFID)[0] is None
+    assert index.contents_version(RFID) is None
@@ -0,0 +1,39 @@
+import pytest
+
+pytest.importorskip("mysql.connector")
+
+from store.SharedDataStore import first_free_index, list_to_mask, mask_to_list
+
+
+def test_mask_list_round_trip():
+    values = [1, 0, 1, 1, 0, 0, 0, 1]
+    mask = list_to_mask(values)
+    assert mask == 0b10001101
+    assert mask_to_list(mask, len(values)) == values
+
+
+def test_mask_to_list_pads_and_truncates_to_length():
+    assert mask_to_list(0b1, 4) == [1, 0, 0, 0]
+    assert mask_to_list(0b110000, 4) == [0, 0, 0, 0]
+
+
+def test_list_to_mask_treats_truthy_as_occupied():
+    assert list_to_mask([0, True, 2, None]) == 0b0110
+
+
+@pytest.mark.parametrize("mask, length, expected", [
+    (0, 10, 0),
+    (0b1, 10, 1),
+    (0b1011, 10, 2),
+    (0b0111111111, 10, 9),
+    (0b1111111111, 10, -1),
+    ((1 << 31) - 1, 31, -1),
+    ((1 << 30) - 1, 31, 30),
+])
+def test_first_free_index(mask, length, expected):
+    assert first_free_index(mask, length) == expected
+
+
+def test_first_free_index_ignores_bits_beyond_length():
+    assert first_free_index(0b11110000, 4) == 0
+    assert first_free_index(0b11111111, 4) == -1
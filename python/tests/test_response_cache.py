@@ -0,0 +1,89 @@
+import xmlrpc.client
+
+from handlers.response_cache import ResponseCache
+
+
+class FakeServer:
+    """Versjon per metode og en dispatcher som teller kall."""
+
+    def __init__(self):
+        self.versions = {"get_a": 1, "get_b": 1}
+        self.calls = 0
+
+    def read_version(self, method, params):
+        return self.versions.get(method)
+
+    def dispatch(self, data):
+        self.calls += 1
+        params, method = xmlrpc.client.loads(data)
+        return xmlrpc.client.dumps(([method, *params],), methodresponse=True).encode()
+
+
+def request(method, *params):
+    return xmlrpc.client.dumps(params, method).encode()
+
+
+def make_cache(**kwargs):
+    server = FakeServer()
+    return server, ResponseCache(server.read_version, ["get_a", "get_b"], **kwargs)
+
+
+def test_hit_returns_stored_bytes_without_dispatch():
+    server, cache = make_cache()
+    etag, first = cache.respond(request("get_a"), server.dispatch)
+    again_etag, again = cache.respond(request("get_a"), server.dispatch)
+    assert (again_etag, again) == (etag, first)
+    assert server.calls == 1
+    assert cache.get_stats()["hits"] == 1
+
+
+def test_if_none_match_gives_304_for_same_key():
+    server, cache = make_cache()
+    etag, _ = cache.respond(request("get_a"), server.dispatch)
+    assert cache.respond(request("get_a"), server.dispatch, etag) == (etag, None)
+    assert cache.get_stats()["not_modified"] == 1
+
+
+def test_etag_is_keyed_on_method_and_params():
+    server, cache = make_cache()
+    etag_a, _ = cache.respond(request("get_a"), server.dispatch)
+    etag_b, body_b = cache.respond(request("get_b"), server.dispatch, etag_a)
+    assert etag_b != etag_a and body_b is not None
+
+    etag_a1, body_a1 = cache.respond(request("get_a", 1), server.dispatch, etag_a)
+    assert etag_a1 != etag_a and body_a1 is not None
+
+
+def test_new_version_invalidates_entry_and_etag():
+    server, cache = make_cache()
+    etag, _ = cache.respond(request("get_a"), server.dispatch)
+    server.versions["get_a"] = 2
+    new_etag, body = cache.respond(request("get_a"), server.dispatch, etag)
+    assert new_etag != etag and body is not None
+    assert server.calls == 2
+
+
+def test_etag_without_stored_entry_is_not_304():
+    server, cache = make_cache()
+    etag, _ = cache.respond(request("get_a"), server.dispatch)
+    cache.clear()
+    assert cache.respond(request("get_a"), server.dispatch, etag)[1] is not None
+
+
+def test_uncached_methods_and_faults_pass_through():
+    server, cache = make_cache()
+    assert cache.respond(request("other"), server.dispatch)[0] is None
+
+    fault = xmlrpc.client.dumps(xmlrpc.client.Fault(1, "feil"), methodresponse=True).encode()
+    etag, body = cache.respond(request("get_a"), lambda data: fault)
+    assert (etag, body) == (None, fault)
+    assert cache.get_stats()["entries"] == 0
+
+
+def test_oldest_entry_evicted_when_full():
+    server, cache = make_cache(max_entries=2)
+    for n in range(3):
+        cache.respond(request("get_a", n), server.dispatch)
+    assert cache.get_stats()["entries"] == 2
+    cache.respond(request("get_a", 0), server.dispatch)
+    assert server.calls == 4
@@ -0,0 +1,58 @@
+import pytest
+
+pytest.importorskip("snap7")
+
+from middleware.s7_com import MAX_VARS, TagGroup
+
+
+class FakePLC:
+    def __init__(self, pdu_length):
+        self.pdu_length = pdu_length
+
+
+def chunk_sizes(nodes, pdu_length=240, write=False):
+    group = TagGroup(FakePLC(pdu_length), nodes)
+    if write:
+        return [len(chunk) for chunk in group._plan(group.node_ids, write=True)]
+    return [len(chunk) for chunk, _items, _buffers in group.read_plan]
+
+
+def bools(count):
+    return [f"DB400,BOOL{i // 8}.{i % 8}" for i in range(count)]
+
+
+def test_read_request_limits_variables_per_pdu():
+    # 12 + 12 * n <= 240 -> 19 adressespesifikasjoner per forespørsel
+    assert chunk_sizes(bools(20)) == [19, 1]
+
+
+def test_max_vars_limits_large_pdu():
+    assert chunk_sizes(bools(25), pdu_length=960) == [MAX_VARS, 25 - MAX_VARS]
+
+
+def test_read_response_size_limits_strings():
+    # 14 + 70 * n <= 240 -> tre STRING (66 byte) per svar
+    strings = [f"DB400,STRING{i * 66}.0" for i in range(4)]
+    assert chunk_sizes(strings) == [3, 1]
+
+
+def test_write_counts_request_and_data():
+    ints = [f"DB400,INT{i * 2}.0" for i in range(13)]
+    assert chunk_sizes(ints) == [13]
+    # 12 + (12 + 4 + 2) * n <= 240 -> 12 INT per skriving
+    assert chunk_sizes(ints, write=True) == [12, 1]
+
+
+def test_duplicates_registered_once():
+    assert chunk_sizes(["DB400,INT0.0", "DB400,INT0.0", "DB500,BOOL0.0"]) == [2]
+
+
+def test_node_larger_than_pdu_rejected():
+    with pytest.raises(ValueError):
+        chunk_sizes(["DB400,STRING0.0"], pdu_length=60)
+
+
+def test_write_rejects_unregistered_node():
+    group = TagGroup(FakePLC(240), ["DB400,INT0.0"])
+    with pytest.raises(ValueError):
+        group.write({"DB400,INT2.0": 1})
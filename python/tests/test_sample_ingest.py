@@ -0,0 +1,101 @@
+import json
+from datetime import datetime
+
+import pytest
+
+from middleware import sample_ingest
+from middleware.sample_ingest import ingest_file, iter_records, resolve_ingest_path, validate_record
+
+RECORD = {
+    "supplier": "Lab A",
+    "sample_taken_time": "2026-03-01T08:30:00",
+    "matrix": "MX000001",
+    "sample_type": "2",
+}
+
+
+def write(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def test_csv_with_sniffed_delimiter(tmp_path):
+    path = write(tmp_path, "a.csv", "supplier;matrix;sample_type\nLab A;MX1;2\nLab B;MX2;1\n")
+    assert [r["matrix"] for r in iter_records(path)] == ["MX1", "MX2"]
+
+
+def test_json_lines_skips_blank_lines(tmp_path):
+    path = write(tmp_path, "a.jsonl", '{"matrix": "MX1"}\n\n{"matrix": "MX2"}\n')
+    assert [r["matrix"] for r in iter_records(path)] == ["MX1", "MX2"]
+
+
+def test_json_array_streams_across_block_boundaries(tmp_path, monkeypatch):
+    monkeypatch.setattr(sample_ingest, "READ_BLOCK_SIZE", 7)
+    records = [{"matrix": f"MX{i}", "comment": "x" * i} for i in range(20)]
+    path = write(tmp_path, "a.json", json.dumps(records, indent=2))
+    assert list(iter_records(path)) == records
+
+
+@pytest.mark.parametrize("text", ['[{"matrix": "MX1"}', '{"matrix": "MX1"}'])
+def test_json_array_rejects_malformed(tmp_path, text):
+    path = write(tmp_path, "a.json", text)
+    with pytest.raises(ValueError):
+        list(iter_records(path))
+
+
+def test_unknown_extension(tmp_path):
+    with pytest.raises(ValueError):
+        iter_records(write(tmp_path, "a.txt", ""))
+
+
+def test_validate_record():
+    row = validate_record({**RECORD, "storage_temp": "-20,5", "comment": "  "}, {1, 2})
+    assert row == ("Lab A", datetime(2026, 3, 1, 8, 30), "MX000001", 2, None, -20.5, None)
+
+
+@pytest.mark.parametrize("changes, message", [
+    ({"matrix": " "}, "mangler matrix"),
+    ({"sample_taken_time": "i går"}, "ugyldig sample_taken_time"),
+    ({"sample_type": "x"}, "ugyldig sample_type"),
+    ({"sample_type": "7"}, "ukjent sample_type 7"),
+    ({"storage_temp": "kald"}, "ugyldig storage_temp"),
+])
+def test_validate_record_errors(changes, message):
+    with pytest.raises(ValueError, match=message):
+        validate_record({**RECORD, **changes}, {1, 2})
+
+
+def test_resolve_ingest_path(tmp_path):
+    base = str(tmp_path)
+    assert resolve_ingest_path("a.csv", base) == str(tmp_path / "a.csv")
+    for path in ("../a.csv", "/etc/passwd", ".", "sub/../../a.csv"):
+        with pytest.raises(ValueError):
+            resolve_ingest_path(path, base)
+
+
+class FakeDB:
+    def __init__(self, existing=()):
+        self.existing = set(existing)
+        self.chunks = []
+
+    def get_sample_type_ids(self):
+        return [1, 2]
+
+    def insert_samples(self, rows):
+        self.chunks.append(len(rows))
+        new = [r for r in rows if r[2] not in self.existing]
+        self.existing.update(r[2] for r in new)
+        return len(new)
+
+
+def test_ingest_file_counts_rows(tmp_path):
+    records = [dict(RECORD, matrix=f"MX{i}") for i in range(5)]
+    records += [dict(RECORD, matrix="MX0"), dict(RECORD, sample_type="9")]
+    path = write(tmp_path, "a.jsonl", "\n".join(json.dumps(r) for r in records))
+    db = FakeDB(existing={"MX4"})
+
+    stats = ingest_file(db, path, chunk_size=2)
+    assert (stats["read"], stats["inserted"], stats["duplicates"], stats["invalid"]) == (7, 4, 2, 1)
+    assert db.chunks == [2, 2, 1]
+    assert stats["errors"] == ["rad 7: ukjent sample_type 9"]
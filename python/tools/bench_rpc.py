@@ -0,0 +1,133 @@
+"""
+bench_rpc.py
+Sammenligner XML-RPC og binær RPC (handlers/binrpc_handler.py) på samme dispatcher:
+• Koding + dekoding av typiske svar (sorteringsrampe og rackinnhold).
+• Rundturstid for sekvensielle kall over én tilkobling (XML-RPC med keep-alive).
+• Gjennomstrømning med pipelining (mange kall ute samtidig på binærprotokollen).
+Kjører mot et eget testobjekt med representative data – ingen PLC eller database trengs.
+Kjør fra python-mappen:
+    python -m tools.bench_rpc [antall kall]
+"""
+
+import asyncio
+import sys
+import threading
+import time
+import xmlrpc.client
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List
+
+from config.rails import RAIL_LENGTH
+from main import create_server
+from handlers.binrpc_handler import (CODEC_JSON, CODEC_MSGPACK, BinaryRpcClient, BinaryRpcServer,
+                                     decode, encode, msgpack)
+from store.SharedDataStore import RUNNING, mask_to_list
+
+HOST = "127.0.0.1"
+XML_PORT = 48400
+BIN_PORT = 48420
+
+
+class BenchStore:
+    """Gir svar på samme form som DataStore for metodene robotklientene poller."""
+
+    def __init__(self) -> None:
+        now = datetime.now().replace(microsecond=0)
+        self.ramp = mask_to_list(0b1011001)   # get_ur_sorting_ramp: RAIL_LENGTH heltall 0/1
+        # get_rack_contents: én rad per posisjon (LEFT JOIN), tomme plasser har NULL-verdier
+        self.contents: List[Dict[str, Any]] = [
+            {
+                "position": pos,
+                "sample_id": 1000 + pos if pos % 3 else None,
+                "matrix": f"MX{pos:06d}" if pos % 3 else None,
+                "sample_test_type": "Blod" if pos % 3 else None,
+                "sample_taken_time": now - timedelta(minutes=pos) if pos % 3 else None,
+            }
+            for pos in range(1, RAIL_LENGTH + 1)
+        ]
+
+    def get_ur_sorting_ramp(self) -> List[int]:
+        return self.ramp
+
+    def get_plc_status(self) -> int:
+        return RUNNING
+
+    def get_rack_contents(self, rack_rfid: str) -> List[Dict[str, Any]]:
+        return self.contents
+
+
+def _timeit(label: str, n: int, func: Callable[[], Any]) -> float:
+    start = time.perf_counter()
+    for _ in range(n):
+        func()
+    per_call = (time.perf_counter() - start) / n * 1e6
+    print(f"  {label:<38} {per_call:9.1f} µs")
+    return per_call
+
+
+def bench_codecs(store: BenchStore, n: int) -> None:
+    print("Koding + dekoding av svar:")
+    for name, value in (("rampe", store.ramp), ("rackinnhold", store.contents)):
+        xml = xmlrpc.client.dumps((value,), methodresponse=True, allow_none=True)
+        size = len(xml.encode())
+        _timeit(f"XML-RPC {name} ({size} B)", n,
+                lambda: xmlrpc.client.loads(
+                    xmlrpc.client.dumps((value,), methodresponse=True, allow_none=True).encode(),
+                    use_datetime=True))
+        codecs = [("JSON", CODEC_JSON)] + ([("msgpack", CODEC_MSGPACK)] if msgpack is not None else [])
+        for codec_name, codec in codecs:
+            size = len(encode(codec, value))
+            _timeit(f"binær/{codec_name} {name} ({size} B)", n,
+                    lambda: decode(codec, encode(codec, value)))
+
+
+def bench_round_trips(n: int) -> None:
+    print("Rundturstid, sekvensielle kall over én tilkobling:")
+    proxy = xmlrpc.client.ServerProxy(f"http://{HOST}:{XML_PORT}", allow_none=True, use_datetime=True)
+    client = BinaryRpcClient(HOST, BIN_PORT)
+    try:
+        for method, params in (("get_ur_sorting_ramp", ()), ("get_rack_contents", ("R1",))):
+            _timeit(f"XML-RPC {method}", n, lambda: getattr(proxy, method)(*params))
+            _timeit(f"binær {method}", n, lambda: client.call(method, *params))
+
+        print("Gjennomstrømning med pipelining (32 kall per skriving):")
+        batch = [("get_ur_sorting_ramp", ()), ("get_plc_status", ())] * 16
+        rounds = max(n // len(batch), 1)
+        start = time.perf_counter()
+        for _ in range(rounds):
+            client.pipeline(batch)
+        elapsed = time.perf_counter() - start
+        print(f"  {'binær pipeline':<38} {rounds * len(batch) / elapsed:9.0f} kall/s")
+
+        multicall_start = time.perf_counter()
+        for _ in range(rounds):
+            multi = xmlrpc.client.MultiCall(proxy)
+            for method, params in batch:
+                getattr(multi, method)(*params)
+            tuple(multi())
+        elapsed = time.perf_counter() - multicall_start
+        print(f"  {'XML-RPC system.multicall':<38} {rounds * len(batch) / elapsed:9.0f} kall/s")
+    finally:
+        client.close()
+        proxy("close")()
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    store = BenchStore()
+    server = create_server(store, host=HOST, port=XML_PORT)  # type: ignore[arg-type]
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    binary = BinaryRpcServer(server, HOST, BIN_PORT)
+    threading.Thread(target=asyncio.run, args=(binary.serve(),), daemon=True).start()
+    time.sleep(0.2)
+
+    try:
+        bench_codecs(store, n)
+        bench_round_trips(n)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()